@@ -79,14 +79,26 @@ PyObject* object_to_gpgme_t(PyObject* input, const char* objtype, int argnum) {
   $1 = NULL;
 }
 
-%typemap(in) gpgme_key_t [] {
+%typemap(in) gpgme_key_t [] (int free_keys = 0) {
   int i, numb = 0;
   if (!PySequence_Check($input)) {
-    PyErr_Format(PyExc_ValueError, "arg %d: Expected a list of gpgme_key_t",
-		 $argnum);
-    return NULL;
-  }
-  if((numb = PySequence_Length($input)) != 0) {
+    /* A key array prebuilt by pygpgme_key_array_new() is used as is,
+       either directly or from the wrapped attribute of a KeySet. */
+    PyObject *pypointer = $input;
+    int res;
+    if (PyObject_HasAttrString($input, "wrapped"))
+      pypointer = PyObject_GetAttrString($input, "wrapped");
+    else
+      Py_INCREF(pypointer);
+    res = SWIG_ConvertPtr(pypointer, (void **) &$1, $descriptor(gpgme_key_t *), 0);
+    Py_XDECREF(pypointer);
+    if (res == -1) {
+      PyErr_Format(PyExc_ValueError, "arg %d: Expected a list of gpgme_key_t",
+		   $argnum);
+      return NULL;
+    }
+  } else if((numb = PySequence_Length($input)) != 0) {
+    free_keys = 1;
     $1 = (gpgme_key_t*)malloc((numb+1)*sizeof(gpgme_key_t));
     for(i=0; i<numb; i++) {
       PyObject *pypointer = PySequence_GetItem($input, i);
@@ -105,7 +117,7 @@ PyObject* object_to_gpgme_t(PyObject* input, const char* objtype, int argnum) {
   }
 }
 %typemap(freearg) gpgme_key_t [] {
-  if ($1) free($1);
+  if (free_keys$argnum && $1) free($1);
 }
 
 // Special handling for references to our objects.
@@ -192,6 +204,49 @@ PyObject* object_to_gpgme_t(PyObject* input, const char* objtype, int argnum) {
     $2 = $input;
 }
 
+// Release the GIL while gpgme waits for the engine so that other Python
+// threads keep running.  Callbacks into Python take it back with
+// PyGILState_Ensure().
+%define PYGPGME_ALLOW_THREADS(func)
+%exception func {
+  Py_BEGIN_ALLOW_THREADS
+  $action
+  Py_END_ALLOW_THREADS
+}
+%enddef
+
+PYGPGME_ALLOW_THREADS(gpgme_op_encrypt);
+PYGPGME_ALLOW_THREADS(gpgme_op_encrypt_sign);
+PYGPGME_ALLOW_THREADS(gpgme_op_decrypt);
+PYGPGME_ALLOW_THREADS(gpgme_op_decrypt_verify);
+PYGPGME_ALLOW_THREADS(gpgme_op_sign);
+PYGPGME_ALLOW_THREADS(gpgme_op_verify);
+PYGPGME_ALLOW_THREADS(gpgme_op_import);
+PYGPGME_ALLOW_THREADS(gpgme_op_import_keys);
+PYGPGME_ALLOW_THREADS(gpgme_op_export);
+PYGPGME_ALLOW_THREADS(gpgme_op_export_ext);
+PYGPGME_ALLOW_THREADS(gpgme_op_export_keys);
+PYGPGME_ALLOW_THREADS(gpgme_op_genkey);
+PYGPGME_ALLOW_THREADS(gpgme_op_delete);
+PYGPGME_ALLOW_THREADS(gpgme_op_edit);
+PYGPGME_ALLOW_THREADS(gpgme_op_card_edit);
+PYGPGME_ALLOW_THREADS(gpgme_op_keylist_start);
+PYGPGME_ALLOW_THREADS(gpgme_op_keylist_ext_start);
+PYGPGME_ALLOW_THREADS(gpgme_op_keylist_next);
+PYGPGME_ALLOW_THREADS(gpgme_op_trustlist_start);
+PYGPGME_ALLOW_THREADS(gpgme_op_trustlist_next);
+PYGPGME_ALLOW_THREADS(gpgme_get_key);
+PYGPGME_ALLOW_THREADS(gpgme_wait);
+PYGPGME_ALLOW_THREADS(gpgme_data_read);
+PYGPGME_ALLOW_THREADS(gpgme_data_write);
+PYGPGME_ALLOW_THREADS(gpgme_data_seek);
+
+%init %{
+#if PY_VERSION_HEX < 0x03070000
+  PyEval_InitThreads();
+#endif
+%}
+
 // Include the header file both for cc (first) and for swig (second)
 // Include for swig locally since we need to fix 'class' usage there.
 %{
@@ -200,6 +255,7 @@ PyObject* object_to_gpgme_t(PyObject* input, const char* objtype, int argnum) {
 %include "gpgme.h"
 
 %constant long EOF = GPG_ERR_EOF;
+%constant long CANCELED = GPG_ERR_CANCELED;
 
 // Generating and handling pointers-to-pointers.
 
@@ -224,12 +280,25 @@ FILE *fdopen(int fildes, const char *mode);
 %}
 %include "helpers.h"
 
+// Key.snapshot() returns an immutable copy of the key, see
+// pyme.core.KeySnapshot.
+%extend _gpgme_key {
+%pythoncode %{
+    def snapshot(self):
+        """Returns the key with its subkeys and user IDs as a compact,
+        picklable pyme.core.KeySnapshot."""
+        from . import core
+        return core.key_snapshot(self)
+%}
+};
+
 %{
 gpgme_error_t pyEditCb(void *opaque, gpgme_status_code_t status,
 		       const char *args, int fd) {
   PyObject *func = NULL, *dataarg = NULL, *pyargs = NULL, *retval = NULL;
   PyObject *pyopaque = (PyObject *) opaque;
   gpgme_error_t err_status = 0;
+  PyGILState_STATE state = PyGILState_Ensure();
 
   pygpgme_exception_init();
 
@@ -261,6 +330,7 @@ gpgme_error_t pyEditCb(void *opaque, gpgme_status_code_t status,
   }
 
   Py_XDECREF(retval);
+  PyGILState_Release(state);
   return err_status;
 }
 %}
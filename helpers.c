@@ -21,6 +21,7 @@
 #include <gpgme.h>
 #include <stdlib.h>
 #include <string.h>
+#include <errno.h>
 #include "Python.h"
 #include "helpers.h"
 
@@ -53,7 +54,9 @@ gpgme_error_t pygpgme_exception2code(void) {
 }
 
 void pygpgme_clear_generic_cb(PyObject **cb) {
-  Py_DECREF(*cb);
+  /* The slot stays empty if setting the callback failed.  */
+  Py_XDECREF(*cb);
+  *cb = NULL;
 }
 
 static gpgme_error_t pyPassphraseCb(void *hook,
@@ -67,6 +70,7 @@ static gpgme_error_t pyPassphraseCb(void *hook,
   PyObject *retval = NULL;
   PyObject *dataarg = NULL;
   gpgme_error_t err_status = 0;  
+  PyGILState_STATE state = PyGILState_Ensure();
 
   pygpgme_exception_init();
 
@@ -101,6 +105,7 @@ static gpgme_error_t pyPassphraseCb(void *hook,
     }
   }
 
+  PyGILState_Release(state);
   return err_status;
 }
 
@@ -119,6 +124,7 @@ static void pyProgressCb(void *hook, const char *what, int type, int current,
 			 int total) {
   PyObject *func = NULL, *dataarg = NULL, *args = NULL, *retval = NULL;
   PyObject *pyhook = (PyObject *) hook;
+  PyGILState_STATE state = PyGILState_Ensure();
   
   if (PyTuple_Check(pyhook)) {
     func = PyTuple_GetItem(pyhook, 0);
@@ -141,6 +147,7 @@ static void pyProgressCb(void *hook, const char *what, int type, int current,
   retval = PyObject_CallObject(func, args);
   Py_DECREF(args);
   Py_XDECREF(retval);
+  PyGILState_Release(state);
 }
 
 void pygpgme_set_progress_cb(gpgme_ctx_t ctx, PyObject *cb, PyObject **freelater){
@@ -152,3 +159,754 @@ void pygpgme_set_progress_cb(gpgme_ctx_t ctx, PyObject *cb, PyObject **freelater
   *freelater = cb;
   gpgme_set_progress_cb(ctx, (gpgme_progress_cb_t) pyProgressCb, (void *) cb);
 }
+
+PyObject *pygpgme_data_readinto(gpgme_data_t dh, PyObject *buffer) {
+  Py_buffer view;
+  ssize_t result;
+
+  if (PyObject_GetBuffer(buffer, &view, PyBUF_WRITABLE | PyBUF_C_CONTIGUOUS) < 0)
+    return NULL;
+  Py_BEGIN_ALLOW_THREADS
+  result = gpgme_data_read(dh, view.buf, (size_t) view.len);
+  Py_END_ALLOW_THREADS
+  PyBuffer_Release(&view);
+
+  if (result < 0)
+    return PyErr_SetFromErrno(PyExc_IOError);
+  return PyLong_FromSsize_t(result);
+}
+
+/* Read up to size bytes straight into a new bytes object, which is
+   shrunk if EOF comes first.  */
+PyObject *pygpgme_data_read_all(gpgme_data_t dh, size_t size) {
+  PyObject *result;
+  size_t done = 0;
+  ssize_t n = 1;
+
+  if ((result = PyBytes_FromStringAndSize(NULL, (Py_ssize_t) size)) == NULL)
+    return NULL;
+  Py_BEGIN_ALLOW_THREADS
+  while (done < size && n > 0) {
+    n = gpgme_data_read(dh, PyBytes_AS_STRING(result) + done, size - done);
+    if (n > 0)
+      done += n;
+  }
+  Py_END_ALLOW_THREADS
+
+  if (n < 0) {
+    Py_DECREF(result);
+    return PyErr_SetFromErrno(PyExc_IOError);
+  }
+  if (done < size && _PyBytes_Resize(&result, (Py_ssize_t) done) < 0)
+    return NULL;
+  return result;
+}
+
+gpgme_error_t pygpgme_data_new_from_buffer(gpgme_data_t *r_dh,
+					   PyObject *buffer) {
+  Py_buffer view;
+  gpgme_error_t err;
+
+  /* The caller keeps an exported view of buffer alive for as long as
+     the data object exists, so the memory can be used without copying. */
+  if (PyObject_GetBuffer(buffer, &view, PyBUF_C_CONTIGUOUS) < 0) {
+    PyErr_Clear();
+    return gpg_error(GPG_ERR_INV_VALUE);
+  }
+  err = gpgme_data_new_from_mem(r_dh, view.buf, (size_t) view.len, 0);
+  PyBuffer_Release(&view);
+  return err;
+}
+
+/* Data callbacks.  The hook is either a tuple
+   ((read_cb, write_cb, seek_cb, release_cb), hook) of Python functions,
+   any of which may be None, or a file-like object providing
+   readinto() (or read()), write() and seek().  File-like objects are
+   handed memoryviews over gpgme's own buffers so no intermediate
+   bytes objects are created. */
+
+static PyObject *pyDataCbFunc(PyObject *pyhook, int index,
+			      PyObject **dataarg) {
+  PyObject *func = PyTuple_GetItem(PyTuple_GetItem(pyhook, 0), index);
+  *dataarg = PyTuple_GetItem(pyhook, 1);
+  return func == Py_None ? NULL : func;
+}
+
+static void pyDataCbRelease(PyObject *view) {
+  PyObject *retval;
+
+  /* Make sure Python code can not keep using gpgme's buffer.  */
+  retval = PyObject_CallMethod(view, "release", NULL);
+  if (retval == NULL)
+    PyErr_WriteUnraisable(view);
+  Py_XDECREF(retval);
+  Py_DECREF(view);
+}
+
+static ssize_t pyDataRead(void *hook, void *buffer, size_t size) {
+  PyObject *pyhook = (PyObject *) hook;
+  PyObject *func = NULL, *dataarg = NULL, *retval = NULL;
+  ssize_t result = -1;
+  Py_buffer view;
+
+  if (PyTuple_Check(pyhook)) {
+    if ((func = pyDataCbFunc(pyhook, 0, &dataarg)) == NULL) {
+      errno = EBADF;
+      return -1;
+    }
+    retval = PyObject_CallFunction(func, "nO", (Py_ssize_t) size, dataarg);
+  } else if (PyObject_HasAttrString(pyhook, "readinto")) {
+    PyObject *mv = PyMemoryView_FromMemory(buffer, size, PyBUF_WRITE);
+    if (mv == NULL)
+      goto error;
+    retval = PyObject_CallMethod(pyhook, "readinto", "O", mv);
+    pyDataCbRelease(mv);
+    if (retval == NULL)
+      goto error;
+    if (retval == Py_None) {	/* Non-blocking object without data. */
+      Py_DECREF(retval);
+      errno = EAGAIN;
+      return -1;
+    }
+    result = PyLong_AsSsize_t(retval);
+    Py_DECREF(retval);
+    if (result < 0 && PyErr_Occurred())
+      goto error;
+    return result;
+  } else {
+    retval = PyObject_CallMethod(pyhook, "read", "n", (Py_ssize_t) size);
+  }
+
+  /* read_cb() or read() returned an object holding the data.  */
+  if (retval == NULL)
+    goto error;
+  if (retval == Py_None) {
+    Py_DECREF(retval);
+    return 0;
+  }
+  if (PyObject_GetBuffer(retval, &view, PyBUF_SIMPLE) < 0) {
+    Py_DECREF(retval);
+    goto error;
+  }
+  if ((size_t) view.len > size) {
+    PyBuffer_Release(&view);
+    Py_DECREF(retval);
+    PyErr_SetString(PyExc_ValueError,
+		    "read callback returned more data than requested");
+    goto error;
+  }
+  memcpy(buffer, view.buf, view.len);
+  result = view.len;
+  PyBuffer_Release(&view);
+  Py_DECREF(retval);
+  return result;
+
+ error:
+  PyErr_WriteUnraisable(pyhook);
+  errno = EIO;
+  return -1;
+}
+
+static ssize_t pyDataWrite(void *hook, const void *buffer, size_t size) {
+  PyObject *pyhook = (PyObject *) hook;
+  PyObject *func = NULL, *dataarg = NULL, *retval = NULL;
+  PyObject *mv = NULL;
+  ssize_t result = -1;
+
+  if (PyTuple_Check(pyhook) &&
+      (func = pyDataCbFunc(pyhook, 1, &dataarg)) == NULL) {
+    errno = EBADF;
+    return -1;
+  }
+
+  mv = PyMemoryView_FromMemory((char *) buffer, size, PyBUF_READ);
+  if (mv == NULL)
+    goto error;
+  if (func)
+    retval = PyObject_CallFunction(func, "OO", mv, dataarg);
+  else
+    retval = PyObject_CallMethod(pyhook, "write", "O", mv);
+  pyDataCbRelease(mv);
+  if (retval == NULL)
+    goto error;
+
+  if (retval == Py_None)
+    result = size;
+  else {
+    result = PyLong_AsSsize_t(retval);
+    if (result < 0 && PyErr_Occurred()) {
+      Py_DECREF(retval);
+      goto error;
+    }
+  }
+  Py_DECREF(retval);
+  return result;
+
+ error:
+  PyErr_WriteUnraisable(pyhook);
+  errno = EIO;
+  return -1;
+}
+
+/* Return whether the pending exception is io.UnsupportedOperation, which
+   file-like objects raise when they can not seek.  */
+static int pyIsUnsupportedOperation(void) {
+  PyObject *type, *value, *traceback, *io, *exc = NULL;
+  int result = 0;
+
+  /* Look the class up with the pending exception set aside.  */
+  PyErr_Fetch(&type, &value, &traceback);
+  if ((io = PyImport_ImportModule("io")) != NULL) {
+    exc = PyObject_GetAttrString(io, "UnsupportedOperation");
+    Py_DECREF(io);
+  }
+  if (exc != NULL) {
+    result = PyErr_GivenExceptionMatches(type, exc);
+    Py_DECREF(exc);
+  }
+  PyErr_Clear();
+  PyErr_Restore(type, value, traceback);
+  return result;
+}
+
+static off_t pyDataSeek(void *hook, off_t offset, int whence) {
+  PyObject *pyhook = (PyObject *) hook;
+  PyObject *func = NULL, *dataarg = NULL, *retval = NULL;
+  off_t result;
+
+  if (PyTuple_Check(pyhook)) {
+    if ((func = pyDataCbFunc(pyhook, 2, &dataarg)) == NULL) {
+      errno = ESPIPE;
+      return -1;
+    }
+    retval = PyObject_CallFunction(func, "LiO", (PY_LONG_LONG) offset,
+				   whence, dataarg);
+  } else if (PyObject_HasAttrString(pyhook, "seek")) {
+    /* Pipes and sockets have seek() too, but it always fails.  */
+    if (PyObject_HasAttrString(pyhook, "seekable")) {
+      int seekable;
+      retval = PyObject_CallMethod(pyhook, "seekable", NULL);
+      if (retval == NULL)
+	goto error;
+      seekable = PyObject_IsTrue(retval);
+      Py_DECREF(retval);
+      if (seekable < 0)
+	goto error;
+      if (!seekable) {
+	errno = ESPIPE;
+	return -1;
+      }
+    }
+    retval = PyObject_CallMethod(pyhook, "seek", "Li", (PY_LONG_LONG) offset,
+				 whence);
+  } else {
+    errno = ESPIPE;
+    return -1;
+  }
+  if (retval == NULL)
+    goto error;
+
+  result = (off_t) PyLong_AsLongLong(retval);
+  Py_DECREF(retval);
+  if (result < 0 && PyErr_Occurred())
+    goto error;
+  return result;
+
+ error:
+  if (pyIsUnsupportedOperation()) {
+    PyErr_Clear();
+    errno = ESPIPE;
+    return -1;
+  }
+  PyErr_WriteUnraisable(pyhook);
+  errno = EIO;
+  return -1;
+}
+
+static void pyDataRelease(void *hook) {
+  PyObject *pyhook = (PyObject *) hook;
+  PyObject *func = NULL, *dataarg = NULL, *retval = NULL;
+
+  /* File-like objects stay owned by the Python Data object.  */
+  if (!PyTuple_Check(pyhook) ||
+      (func = pyDataCbFunc(pyhook, 3, &dataarg)) == NULL)
+    return;
+
+  retval = PyObject_CallFunction(func, "O", dataarg);
+  if (retval == NULL)
+    PyErr_WriteUnraisable(pyhook);
+  Py_XDECREF(retval);
+}
+
+/* gpgme calls these with the GIL released.  */
+static ssize_t pyDataReadCb(void *hook, void *buffer, size_t size) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  ssize_t result = pyDataRead(hook, buffer, size);
+  int saved_errno = errno;
+  PyGILState_Release(state);
+  errno = saved_errno;
+  return result;
+}
+
+static ssize_t pyDataWriteCb(void *hook, const void *buffer, size_t size) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  ssize_t result = pyDataWrite(hook, buffer, size);
+  int saved_errno = errno;
+  PyGILState_Release(state);
+  errno = saved_errno;
+  return result;
+}
+
+static off_t pyDataSeekCb(void *hook, off_t offset, int whence) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  off_t result = pyDataSeek(hook, offset, whence);
+  int saved_errno = errno;
+  PyGILState_Release(state);
+  errno = saved_errno;
+  return result;
+}
+
+static void pyDataReleaseCb(void *hook) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  pyDataRelease(hook);
+  PyGILState_Release(state);
+}
+
+static struct gpgme_data_cbs pyDataCbs = {
+  pyDataReadCb,
+  pyDataWriteCb,
+  pyDataSeekCb,
+  pyDataReleaseCb
+};
+
+gpgme_error_t pygpgme_data_new_from_cbs(gpgme_data_t *r_data, PyObject *pycbs,
+					PyObject **freelater) {
+  if (PyTuple_Check(pycbs) &&
+      (PyTuple_Size(pycbs) != 2 || !PyTuple_Check(PyTuple_GetItem(pycbs, 0)) ||
+       PyTuple_Size(PyTuple_GetItem(pycbs, 0)) != 4))
+    return gpg_error(GPG_ERR_INV_VALUE);
+
+  Py_INCREF(pycbs);
+  *freelater = pycbs;
+  return gpgme_data_new_from_cbs(r_data, &pyDataCbs, (void *) pycbs);
+}
+
+/* Memory sinks.  Like gpgme's own memory objects, but the buffer can be
+   emptied in place by pygpgme_data_sink_reset(), so a sink can be reused
+   as operation output without creating a new data object.  The buffer
+   is owned by a capsule kept by the Python Data object; the callbacks
+   never touch Python objects and run without the GIL.  */
+
+struct pygpgme_membuf {
+  char *buf;
+  size_t size;			/* Amount of data in buf.  */
+  size_t alloc;			/* Allocated size of buf.  */
+  size_t pos;
+};
+
+static ssize_t memRead(void *hook, void *buffer, size_t size) {
+  struct pygpgme_membuf *mb = (struct pygpgme_membuf *) hook;
+
+  if (mb->pos >= mb->size)
+    return 0;
+  if (size > mb->size - mb->pos)
+    size = mb->size - mb->pos;
+  memcpy(buffer, mb->buf + mb->pos, size);
+  mb->pos += size;
+  return size;
+}
+
+static ssize_t memWrite(void *hook, const void *buffer, size_t size) {
+  struct pygpgme_membuf *mb = (struct pygpgme_membuf *) hook;
+  size_t end = mb->pos + size;
+
+  if (end < mb->pos) {
+    errno = EFBIG;
+    return -1;
+  }
+  if (end > mb->alloc) {
+    size_t alloc = mb->alloc ? mb->alloc : 4096;
+    char *buf;
+
+    while (alloc < end)
+      alloc = alloc * 2 > alloc ? alloc * 2 : end;
+    if ((buf = (char *) realloc(mb->buf, alloc)) == NULL) {
+      errno = ENOMEM;
+      return -1;
+    }
+    mb->buf = buf;
+    mb->alloc = alloc;
+  }
+  if (mb->pos > mb->size)	/* Fill the gap after seeking past the end.  */
+    memset(mb->buf + mb->size, 0, mb->pos - mb->size);
+  memcpy(mb->buf + mb->pos, buffer, size);
+  mb->pos = end;
+  if (end > mb->size)
+    mb->size = end;
+  return size;
+}
+
+static off_t memSeek(void *hook, off_t offset, int whence) {
+  struct pygpgme_membuf *mb = (struct pygpgme_membuf *) hook;
+  off_t pos;
+
+  switch (whence) {
+  case SEEK_SET:
+    pos = offset;
+    break;
+  case SEEK_CUR:
+    pos = (off_t) mb->pos + offset;
+    break;
+  case SEEK_END:
+    pos = (off_t) mb->size + offset;
+    break;
+  default:
+    errno = EINVAL;
+    return -1;
+  }
+  if (pos < 0) {
+    errno = EINVAL;
+    return -1;
+  }
+  mb->pos = (size_t) pos;
+  return pos;
+}
+
+static struct gpgme_data_cbs memDataCbs = {
+  memRead,
+  memWrite,
+  memSeek,
+  NULL
+};
+
+static void pyMembufDestroy(PyObject *capsule) {
+  struct pygpgme_membuf *mb;
+
+  mb = (struct pygpgme_membuf *) PyCapsule_GetPointer(capsule, "pyme.membuf");
+  free(mb->buf);
+  free(mb);
+}
+
+gpgme_error_t pygpgme_data_new_sink(gpgme_data_t *r_data,
+				    PyObject **freelater) {
+  struct pygpgme_membuf *mb;
+  PyObject *capsule;
+  gpgme_error_t err;
+
+  if ((mb = (struct pygpgme_membuf *) calloc(1, sizeof *mb)) == NULL)
+    return gpg_error(GPG_ERR_ENOMEM);
+  if ((capsule = PyCapsule_New(mb, "pyme.membuf", pyMembufDestroy)) == NULL) {
+    PyErr_Clear();
+    free(mb);
+    return gpg_error(GPG_ERR_ENOMEM);
+  }
+  err = gpgme_data_new_from_cbs(r_data, &memDataCbs, (void *) mb);
+  if (err) {
+    Py_DECREF(capsule);
+    return err;
+  }
+  *freelater = capsule;
+  return 0;
+}
+
+void pygpgme_data_sink_reset(PyObject **sink) {
+  struct pygpgme_membuf *mb;
+
+  mb = (struct pygpgme_membuf *) PyCapsule_GetPointer(*sink, "pyme.membuf");
+  if (mb == NULL) {
+    PyErr_Clear();
+    return;
+  }
+  /* Keep the allocation for the next use.  */
+  mb->size = 0;
+  mb->pos = 0;
+}
+
+/* External event loop support.  The handler is a Python object with the
+   methods add(fd, dir, tag), remove(tag) and event(type, err).  tag is a
+   capsule to be passed to pygpgme_io_dispatch() once fd is ready. */
+
+struct pygpgme_io_tag {
+  gpgme_io_cb_t fnc;
+  void *fnc_data;
+  int fd;
+  PyObject *handler;		/* Kept alive by the Context object. */
+  PyObject *capsule;		/* Dropped when gpgme removes the tag. */
+};
+
+static void pyIoTagDestroy(PyObject *capsule) {
+  free(PyCapsule_GetPointer(capsule, "pyme.io_tag"));
+}
+
+static gpgme_error_t pyAddIoCb(void *data, int fd, int dir, gpgme_io_cb_t fnc,
+			       void *fnc_data, void **r_tag) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  struct pygpgme_io_tag *tag;
+  PyObject *retval;
+  gpgme_error_t err = 0;
+
+  tag = (struct pygpgme_io_tag *) malloc(sizeof *tag);
+  if (tag == NULL) {
+    PyGILState_Release(state);
+    return gpg_error(GPG_ERR_ENOMEM);
+  }
+  tag->fnc = fnc;
+  tag->fnc_data = fnc_data;
+  tag->fd = fd;
+  tag->handler = (PyObject *) data;
+  tag->capsule = PyCapsule_New(tag, "pyme.io_tag", pyIoTagDestroy);
+  if (tag->capsule == NULL) {
+    free(tag);
+    PyErr_WriteUnraisable((PyObject *) data);
+    PyGILState_Release(state);
+    return gpg_error(GPG_ERR_GENERAL);
+  }
+
+  retval = PyObject_CallMethod(tag->handler, "add", "iiO", fd, dir,
+			       tag->capsule);
+  if (retval == NULL) {
+    PyErr_WriteUnraisable(tag->handler);
+    Py_DECREF(tag->capsule);	/* Frees tag. */
+    err = gpg_error(GPG_ERR_GENERAL);
+  } else {
+    Py_DECREF(retval);
+    *r_tag = tag;
+  }
+  PyGILState_Release(state);
+  return err;
+}
+
+static void pyRemoveIoCb(void *r_tag) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  struct pygpgme_io_tag *tag = (struct pygpgme_io_tag *) r_tag;
+  PyObject *capsule = tag->capsule;
+  PyObject *retval;
+
+  /* The handler may still hold the capsule, so only mark it dead. */
+  tag->fnc = NULL;
+  retval = PyObject_CallMethod(tag->handler, "remove", "O", capsule);
+  if (retval == NULL)
+    PyErr_WriteUnraisable(tag->handler);
+  Py_XDECREF(retval);
+  Py_DECREF(capsule);
+  PyGILState_Release(state);
+}
+
+static void pyEventIoCb(void *data, gpgme_event_io_t type, void *type_data) {
+  PyGILState_STATE state = PyGILState_Ensure();
+  PyObject *handler = (PyObject *) data;
+  PyObject *retval;
+  gpgme_error_t err = 0;
+
+  /* Since gpgme 1.7 DONE carries both the error of the I/O and the
+     error of the operation itself, which is left in op_err when only the
+     latter failed.  Older versions pass a plain gpgme_error_t *.  */
+  if (type == GPGME_EVENT_DONE && type_data != NULL) {
+#if GPGME_VERSION_NUMBER >= 0x010700
+    gpgme_io_event_done_data_t done_data =
+      (gpgme_io_event_done_data_t) type_data;
+    err = done_data->err ? done_data->err : done_data->op_err;
+#else
+    err = *(gpgme_error_t *) type_data;
+#endif
+  }
+
+  retval = PyObject_CallMethod(handler, "event", "il", (int) type, (long) err);
+  if (retval == NULL)
+    PyErr_WriteUnraisable(handler);
+  Py_XDECREF(retval);
+  PyGILState_Release(state);
+}
+
+void pygpgme_set_io_cbs(gpgme_ctx_t ctx, PyObject *handler,
+			PyObject **freelater) {
+  struct gpgme_io_cbs io_cbs;
+
+  if (handler == Py_None) {
+    memset(&io_cbs, 0, sizeof io_cbs);
+    gpgme_set_io_cbs(ctx, &io_cbs);
+    return;
+  }
+  Py_INCREF(handler);
+  *freelater = handler;
+  io_cbs.add = pyAddIoCb;
+  io_cbs.add_priv = (void *) handler;
+  io_cbs.remove = pyRemoveIoCb;
+  io_cbs.event = pyEventIoCb;
+  io_cbs.event_priv = (void *) handler;
+  gpgme_set_io_cbs(ctx, &io_cbs);
+}
+
+gpgme_error_t pygpgme_io_dispatch(PyObject *capsule) {
+  struct pygpgme_io_tag *tag;
+  gpgme_io_cb_t fnc;
+  gpgme_error_t err;
+
+  tag = (struct pygpgme_io_tag *) PyCapsule_GetPointer(capsule, "pyme.io_tag");
+  if (tag == NULL) {
+    PyErr_Clear();
+    return gpg_error(GPG_ERR_INV_VALUE);
+  }
+  if ((fnc = tag->fnc) == NULL)
+    return 0;
+
+  /* The caller holds a reference to capsule, so tag stays valid even if
+     gpgme removes it meanwhile.  */
+  Py_BEGIN_ALLOW_THREADS
+  err = fnc(tag->fnc_data, tag->fd);
+  Py_END_ALLOW_THREADS
+  return err;
+}
+
+gpgme_key_t *pygpgme_key_array_new(gpgme_key_t keys[]) {
+  gpgme_key_t *result;
+  int i, numb = 0;
+
+  if (keys)
+    while (keys[numb])
+      numb++;
+  result = (gpgme_key_t *) malloc((numb + 1) * sizeof(gpgme_key_t));
+  if (result == NULL)
+    return NULL;
+  for (i = 0; i < numb; i++) {
+    gpgme_key_ref(keys[i]);
+    result[i] = keys[i];
+  }
+  result[numb] = NULL;
+  return result;
+}
+
+void pygpgme_key_array_free(gpgme_key_t *keys) {
+  int i;
+
+  if (keys == NULL)
+    return;
+  for (i = 0; keys[i]; i++)
+    gpgme_key_unref(keys[i]);
+  free(keys);
+}
+
+gpgme_error_t pygpgme_signers_set(gpgme_ctx_t ctx, gpgme_key_t keys[]) {
+  gpgme_error_t err;
+  int i;
+
+  gpgme_signers_clear(ctx);
+  for (i = 0; keys && keys[i]; i++)
+    if ((err = gpgme_signers_add(ctx, keys[i])) != 0)
+      return err;
+  return 0;
+}
+
+PyObject *pygpgme_verify_result_records(gpgme_ctx_t ctx, PyObject *record) {
+  gpgme_verify_result_t result = gpgme_op_verify_result(ctx);
+  gpgme_signature_t sig;
+  PyObject *list, *item;
+
+  if ((list = PyList_New(0)) == NULL || result == NULL)
+    return list;
+  for (sig = result->signatures; sig != NULL; sig = sig->next) {
+    item = PyObject_CallFunction(record, "zkiki", sig->fpr,
+				 (unsigned long) sig->status, (int) sig->summary,
+				 (unsigned long) sig->timestamp,
+				 (int) sig->validity);
+    if (item == NULL || PyList_Append(list, item) < 0) {
+      Py_XDECREF(item);
+      Py_DECREF(list);
+      return NULL;
+    }
+    Py_DECREF(item);
+  }
+  return list;
+}
+
+/* Return s as a str, or None if it is NULL, decoded the way SWIG
+   converts char * members.  */
+static PyObject *pyString(const char *s) {
+  if (s == NULL) {
+    Py_INCREF(Py_None);
+    return Py_None;
+  }
+  return PyUnicode_DecodeUTF8(s, strlen(s), "surrogateescape");
+}
+
+static PyObject *pySubkeySnapshot(gpgme_subkey_t subkey, PyObject *record) {
+  return PyObject_CallFunction(record, "NNiIllNNNNNNNNNN",
+			       pyString(subkey->fpr), pyString(subkey->keyid),
+			       (int) subkey->pubkey_algo, subkey->length,
+			       (long) subkey->timestamp, (long) subkey->expires,
+			       PyBool_FromLong(subkey->revoked),
+			       PyBool_FromLong(subkey->expired),
+			       PyBool_FromLong(subkey->disabled),
+			       PyBool_FromLong(subkey->invalid),
+			       PyBool_FromLong(subkey->can_encrypt),
+			       PyBool_FromLong(subkey->can_sign),
+			       PyBool_FromLong(subkey->can_certify),
+			       PyBool_FromLong(subkey->can_authenticate),
+			       PyBool_FromLong(subkey->secret),
+			       PyBool_FromLong(subkey->is_qualified));
+}
+
+static PyObject *pyUidSnapshot(gpgme_user_id_t uid, PyObject *record) {
+  return PyObject_CallFunction(record, "NNNNiNN",
+			       pyString(uid->uid), pyString(uid->name),
+			       pyString(uid->email), pyString(uid->comment),
+			       (int) uid->validity,
+			       PyBool_FromLong(uid->revoked),
+			       PyBool_FromLong(uid->invalid));
+}
+
+PyObject *pygpgme_key_snapshot(gpgme_key_t key, PyObject *keyrecord,
+			       PyObject *subkeyrecord, PyObject *uidrecord) {
+  gpgme_subkey_t subkey;
+  gpgme_user_id_t uid;
+  PyObject *subkeys = NULL, *uids = NULL, *item;
+  Py_ssize_t i, n;
+  unsigned long last_update = 0;
+
+  if (key == NULL) {
+    PyErr_SetString(PyExc_ValueError, "Expected a key, got None");
+    return NULL;
+  }
+  for (n = 0, subkey = key->subkeys; subkey != NULL; subkey = subkey->next)
+    n++;
+  if ((subkeys = PyTuple_New(n)) == NULL)
+    goto fail;
+  for (i = 0, subkey = key->subkeys; i < n; i++, subkey = subkey->next) {
+    if ((item = pySubkeySnapshot(subkey, subkeyrecord)) == NULL)
+      goto fail;
+    PyTuple_SET_ITEM(subkeys, i, item);
+  }
+  for (n = 0, uid = key->uids; uid != NULL; uid = uid->next)
+    n++;
+  if ((uids = PyTuple_New(n)) == NULL)
+    goto fail;
+  for (i = 0, uid = key->uids; i < n; i++, uid = uid->next) {
+    if ((item = pyUidSnapshot(uid, uidrecord)) == NULL)
+      goto fail;
+    PyTuple_SET_ITEM(uids, i, item);
+  }
+
+#if GPGME_VERSION_NUMBER >= 0x010800
+  last_update = key->last_update;
+#endif
+  /* The N conversions steal the references to subkeys and uids.  */
+  return PyObject_CallFunction(keyrecord, "NiiNNNNNNNNNNkNN",
+			       pyString(key->subkeys ? key->subkeys->fpr : NULL),
+			       (int) key->protocol, (int) key->owner_trust,
+			       PyBool_FromLong(key->revoked),
+			       PyBool_FromLong(key->expired),
+			       PyBool_FromLong(key->disabled),
+			       PyBool_FromLong(key->invalid),
+			       PyBool_FromLong(key->can_encrypt),
+			       PyBool_FromLong(key->can_sign),
+			       PyBool_FromLong(key->can_certify),
+			       PyBool_FromLong(key->can_authenticate),
+			       PyBool_FromLong(key->secret),
+			       PyBool_FromLong(key->is_qualified),
+			       last_update, subkeys, uids);
+
+ fail:
+  Py_XDECREF(subkeys);
+  Py_XDECREF(uids);
+  return NULL;
+}
@@ -34,3 +34,32 @@ void pygpgme_clear_generic_cb(PyObject **cb);
 void pygpgme_set_passphrase_cb(gpgme_ctx_t ctx, PyObject *cb,
 			       PyObject **freelater);
 void pygpgme_set_progress_cb(gpgme_ctx_t ctx, PyObject *cb, PyObject **freelater);
+
+PyObject *pygpgme_data_readinto(gpgme_data_t dh, PyObject *buffer);
+PyObject *pygpgme_data_read_all(gpgme_data_t dh, size_t size);
+gpgme_error_t pygpgme_data_new_from_buffer(gpgme_data_t *r_dh,
+					   PyObject *buffer);
+gpgme_error_t pygpgme_data_new_from_cbs(gpgme_data_t *r_data, PyObject *pycbs,
+					PyObject **freelater);
+gpgme_error_t pygpgme_data_new_sink(gpgme_data_t *r_data,
+				    PyObject **freelater);
+void pygpgme_data_sink_reset(PyObject **sink);
+
+void pygpgme_set_io_cbs(gpgme_ctx_t ctx, PyObject *handler,
+			PyObject **freelater);
+gpgme_error_t pygpgme_io_dispatch(PyObject *capsule);
+
+/* NULL terminated key arrays holding a reference to each key, to be
+   passed to operations in place of a list of keys.  */
+gpgme_key_t *pygpgme_key_array_new(gpgme_key_t keys[]);
+void pygpgme_key_array_free(gpgme_key_t *keys);
+gpgme_error_t pygpgme_signers_set(gpgme_ctx_t ctx, gpgme_key_t keys[]);
+
+/* Build a list of record(fpr, status, summary, timestamp, validity)
+   objects for the signatures of the last verify operation.  */
+PyObject *pygpgme_verify_result_records(gpgme_ctx_t ctx, PyObject *record);
+
+/* Convert key, its subkeys and its user IDs in one pass to immutable
+   keyrecord, subkeyrecord and uidrecord objects.  */
+PyObject *pygpgme_key_snapshot(gpgme_key_t key, PyObject *keyrecord,
+			       PyObject *subkeyrecord, PyObject *uidrecord);
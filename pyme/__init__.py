@@ -127,6 +127,13 @@ Error classes: pyme.errors
 Constants: pyme.constants
 Version information: pyme.version
 Utilities: pyme.util
+Object pools: pyme.pool
+asyncio support: pyme.aio
+Concurrent operations: pyme.scheduler
+Batch operations: pyme.batch
+Worker processes: pyme.executor
+Key lookup cache: pyme.keycache
+Keyring index: pyme.keyindex
 
 Base classes are documented at pyme.core.
 Classes of pyme.util usually are not instantiated by users
@@ -134,4 +141,6 @@ directly but return by methods of base classes.
 
 """
 
-__all__ = ['core', 'errors', 'constants', 'util', 'callbacks', 'version']
+__all__ = ['core', 'errors', 'constants', 'util', 'callbacks', 'version',
+           'pool', 'aio', 'scheduler', 'batch', 'executor', 'keycache',
+           'keyindex']
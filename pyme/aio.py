@@ -0,0 +1,92 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""asyncio support.
+
+Operations are started with their op_*_start() variant and the engine
+file descriptors are registered with the asyncio event loop through
+gpgme's external event loop interface (Context.set_io_cbs()), so many
+operations can run concurrently on a single thread:
+
+    await ctx.encrypt_async([key], 1, plain, cipher)
+"""
+
+import asyncio
+from . import pygpgme
+from .errors import errorcheck
+
+class AsyncIOHandler(object):
+    """Context.set_io_cbs() handler registering gpgme's file descriptors
+    with an asyncio event loop.  The future done receives the status of
+    the operation once gpgme reports it finished."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.done = loop.create_future()
+        self._tags = {}
+
+    def add(self, fd, dir, tag):
+        if dir:
+            self.loop.add_reader(fd, self._dispatch, tag)
+        else:
+            self.loop.add_writer(fd, self._dispatch, tag)
+        self._tags[tag] = (fd, dir)
+
+    def remove(self, tag):
+        fd, dir = self._tags.pop(tag)
+        if dir:
+            self.loop.remove_reader(fd)
+        else:
+            self.loop.remove_writer(fd)
+
+    def event(self, type, err):
+        if type == pygpgme.GPGME_EVENT_DONE:
+            self._finish(err)
+
+    def close(self):
+        """Unregisters all file descriptors still known to the handler."""
+        for tag in list(self._tags):
+            self.remove(tag)
+
+    def _dispatch(self, tag):
+        err = pygpgme.pygpgme_io_dispatch(tag)
+        if err:
+            self._finish(err)
+
+    def _finish(self, err):
+        if not self.done.done():
+            self.done.set_result(err)
+
+async def run(ctx, name, *args):
+    """Runs the operation name (for instance 'op_encrypt') of the Context
+    ctx with args on the running event loop and returns when it has
+    finished.  Raises GPGMEError if it failed.  If the waiting task is
+    cancelled, the gpgme operation is cancelled as well."""
+    handler = AsyncIOHandler(asyncio.get_running_loop())
+    ctx.set_io_cbs(handler)
+    try:
+        getattr(ctx, name + '_start')(*args)
+        try:
+            err = await handler.done
+        except BaseException:
+            pygpgme.gpgme_cancel(ctx.wrapped)
+            raise
+        errorcheck(err, "Invocation of gpgme_" + name)
+    finally:
+        handler.close()
+        ctx.set_io_cbs(None)
+        ctx._operation_done()
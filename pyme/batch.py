@@ -0,0 +1,181 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""Batch operations over many inputs.
+
+The functions here take an iterable of inputs and a Context or a
+pool.ContextPool.  With a pool, items are processed by as many threads
+as the pool has contexts; gpgme releases the interpreter lock while the
+engine works, so they run in parallel.  Results are yielded as compact
+records and a failing item is reported in its record instead of
+aborting the batch.
+
+Inputs may be Data objects, file names (memory mapped), file-like
+objects or buffers (used without copying)."""
+
+import os
+import collections
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from . import core
+from . import errors
+from . import pool
+
+class VerifyItem(collections.namedtuple('VerifyItem',
+                                         'index signatures error')):
+    """Outcome of one verify_many() item: its position in the input, a
+    list of core.SignatureRecord, and the exception (usually a GPGMEError,
+    or for instance an OSError for a missing input file) if the
+    verification could not be performed (signatures is then None)."""
+    __slots__ = ()
+
+class DecryptItem(collections.namedtuple('DecryptItem',
+                                          'index plaintext decrypt verify '
+                                          'error')):
+    """Outcome of one decrypt_many() item: its position in the input, the
+    plaintext string, a core.DecryptRecord, a list of
+    core.SignatureRecord (None if signatures were not checked), and the
+    exception (usually a GPGMEError) if the item failed (plaintext is
+    then None, and so is decrypt unless gpgme got to decrypting)."""
+    __slots__ = ()
+
+def _data(obj):
+    """Returns a Data object reading from obj."""
+    if obj == None or isinstance(obj, core.Data):
+        return obj
+    if type(obj) == str:
+        return core.Data(file=obj, copy=False)
+    if hasattr(obj, 'read'):
+        return core.Data(cbs=obj)
+    return core.Data(obj, copy=False)
+
+def _run(func, items, contexts, ordered):
+    """Yields func(ctx, index, *item) for every item, using contexts (a
+    Context or a ContextPool, a new Context if None)."""
+    if not isinstance(contexts, pool.ContextPool):
+        if contexts == None:
+            contexts = core.Context()
+        for index, item in enumerate(items):
+            yield func(contexts, index, *item)
+        return
+
+    def task(index, item):
+        with contexts.context() as ctx:
+            return func(ctx, index, *item)
+
+    # Keep a bounded number of items in flight so that huge inputs are
+    # not materialized at once.
+    window = 2 * contexts.size
+    executor = ThreadPoolExecutor(contexts.size)
+    try:
+        inflight = collections.deque()
+        for index, item in enumerate(items):
+            inflight.append(executor.submit(task, index, item))
+            while len(inflight) >= window:
+                for result in _collect(inflight, ordered):
+                    yield result
+        while inflight:
+            for result in _collect(inflight, ordered):
+                yield result
+    finally:
+        executor.shutdown()
+
+def _collect(inflight, ordered):
+    if ordered:
+        return [inflight.popleft().result()]
+    done = wait(inflight, return_when=FIRST_COMPLETED)[0]
+    for future in done:
+        inflight.remove(future)
+    return [future.result() for future in done]
+
+def _verify(ctx, index, sig, signed = None):
+    try:
+        sig = _data(sig)
+        signed = _data(signed)
+        if signed == None:
+            plain = core.Data()
+        else:
+            plain = None
+        ctx.op_verify(sig, signed, plain)
+        return VerifyItem(index, ctx.op_verify_records(), None)
+    except Exception as excp:
+        return VerifyItem(index, None, excp)
+
+def verify_many(pairs, contexts = None, ordered = True):
+    """Generator verifying every (signature, signed data) pair of the
+    iterable pairs and yielding a VerifyItem for each.  If the signed
+    data is None the signature is expected to be a normal or cleartext
+    signed message.
+
+    contexts is a Context or a pool.ContextPool to verify with.  Items
+    are yielded in input order unless ordered is False, in which case
+    they come in order of completion."""
+    return _run(_verify, pairs, contexts, ordered)
+
+def _decrypt_record(ctx):
+    try:
+        return ctx.op_decrypt_record()
+    except Exception:
+        return None
+
+def decrypt_many(ciphertexts, contexts = None, ordered = True, verify = True,
+                 buffers = None):
+    """Generator decrypting every ciphertext of the iterable ciphertexts
+    and yielding a DecryptItem for each.  With verify set, signatures of
+    signed messages are checked as well (op_decrypt_verify()).
+
+    contexts is a Context or a pool.ContextPool to decrypt with and
+    buffers a pool.DataPool providing the output objects, which are
+    reused from item to item.  Items are yielded in input order unless
+    ordered is False, in which case they come in order of completion."""
+    if buffers == None:
+        if isinstance(contexts, pool.ContextPool):
+            buffers = pool.DataPool(contexts.size)
+        else:
+            buffers = pool.DataPool(1)
+
+    def decrypt(ctx, index, cipher):
+        try:
+            cipher = _data(cipher)
+        except Exception as excp:
+            # gpgme never ran, so there is no decrypt result either.
+            return DecryptItem(index, None, None, None, excp)
+        plain = buffers.get()
+        try:
+            if verify:
+                ctx.op_decrypt_verify(cipher, plain)
+            else:
+                ctx.op_decrypt(cipher, plain)
+            plain.seek(0, os.SEEK_SET)
+            plaintext = plain.read()
+            if verify:
+                signatures = ctx.op_verify_records()
+            else:
+                signatures = None
+            return DecryptItem(index, plaintext, ctx.op_decrypt_record(),
+                               signatures, None)
+        except Exception as excp:
+            if isinstance(excp, errors.OperationTimeout):
+                # Raised before the operation was started.
+                record = None
+            else:
+                record = _decrypt_record(ctx)
+            return DecryptItem(index, None, record, None, excp)
+        finally:
+            buffers.put(plain)
+
+    return _run(decrypt, ((cipher,) for cipher in ciphertexts), contexts,
+                ordered)
@@ -19,11 +19,37 @@
 # import generators for portability with python2.2
 
 
+import os
+import itertools
+import collections
+import stat
+import mmap
+import tempfile
+import threading
+from contextlib import contextmanager
 from . import pygpgme
 from .errors import errorcheck
 from . import errors
 from .util import GpgmeWrapper
 
+# Context operations changing the keyring, see Context.set_key_cache().
+_keyring_modifiers = set(['op_import', 'op_import_start', 'op_import_keys',
+                          'op_import_keys_start', 'op_delete',
+                          'op_delete_start', 'op_delete_ext',
+                          'op_delete_ext_start', 'op_edit_start',
+                          'op_card_edit', 'op_card_edit_start',
+                          'op_interact', 'op_interact_start', 'op_genkey',
+                          'op_genkey_start', 'op_createkey',
+                          'op_createkey_start', 'op_createsubkey',
+                          'op_createsubkey_start', 'op_adduid',
+                          'op_adduid_start', 'op_revuid', 'op_revuid_start',
+                          'op_keysign', 'op_keysign_start', 'op_setexpire',
+                          'op_setexpire_start', 'op_tofu_policy',
+                          'op_tofu_policy_start'])
+
+# Fill value telling exhausted iterables apart from None items.
+_missing = object()
+
 class Context(GpgmeWrapper):
     """From the GPGME C documentation:
 
@@ -64,10 +90,45 @@ class Context(GpgmeWrapper):
             self.own = True
         self.last_passcb = None
         self.last_progresscb = None
+        self.last_iocb = None
+        self._key_cache = None
+        self._stale_cache = None
+        self._deadline = None
+
+    def __getattr__(self, name):
+        func = GpgmeWrapper.__getattr__(self, name)
+        if func == None or not name.startswith('op_') or \
+               name.endswith('_result'):
+            return func
+        cache = self._key_cache
+        if name not in _keyring_modifiers:
+            cache = None
+        def _operation(*args, **kwargs):
+            self._check_deadline()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                if cache != None:
+                    cache.clear()
+                    # An asynchronous operation changes the keyring only
+                    # later, meanwhile get_key() may cache old keys again.
+                    if name.endswith('_start'):
+                        self._stale_cache = cache
+        _operation.__doc__ = func.__doc__
+        return _operation
+
+    def _operation_done(self):
+        """Called once an asynchronous operation has completed; clears the
+        key cache again if the operation changed the keyring."""
+        cache = self._stale_cache
+        if cache != None:
+            self._stale_cache = None
+            cache.clear()
 
     def __del__(self):
         self._free_passcb()
         self._free_progresscb()
+        self._free_iocb()
         if self.own:
             pygpgme.gpgme_release(self.wrapped)
 
@@ -83,6 +144,12 @@ class Context(GpgmeWrapper):
             pygpgme.delete_PyObject_p_p(self.last_progresscb)
             self.last_progresscb = None
 
+    def _free_iocb(self):
+        if self.last_iocb != None:
+            pygpgme.pygpgme_clear_generic_cb(self.last_iocb)
+            pygpgme.delete_PyObject_p_p(self.last_iocb)
+            self.last_iocb = None
+
     def op_keylist_all(self, *args, **kwargs):
         self.op_keylist_start(*args, **kwargs)
         key = self.op_keylist_next()
@@ -90,10 +157,19 @@ class Context(GpgmeWrapper):
             yield key
             key = self.op_keylist_next()
 
+    def op_keylist_snapshots(self, pattern = None, secret = False):
+        """Lists the keys matching pattern like op_keylist_all(), but
+        yields every key as a KeySnapshot converted in a single pass
+        instead of a Key whose subkeys and uids are rebuilt on every
+        access.  The keys themselves are released right away."""
+        for key in self.op_keylist_all(pattern, secret):
+            yield key_snapshot(key)
+
     def op_keylist_next(self):
         """Returns the next key in the list created
         by a call to op_keylist_start().  The object returned
         is of type Key."""
+        self._check_deadline()
         ptr = pygpgme.new_gpgme_key_t_p()
         try:
             errorcheck(pygpgme.gpgme_op_keylist_next(self.wrapped, ptr))
@@ -107,14 +183,29 @@ class Context(GpgmeWrapper):
             key.__del__ = lambda self: pygpgme.gpgme_key_unref(self)
             return key
     
+    def set_key_cache(self, cache):
+        """Makes get_key() consult cache, a pyme.keycache.KeyCache, before
+        asking the engine.  Keyring changing operations run through this
+        context clear the cache, asynchronous ones both when they are
+        started and when they complete through wait(), pyme.aio or a
+        pyme.scheduler.Scheduler.  Pass None to stop caching."""
+        self._key_cache = cache
+
     def get_key(self, fpr, secret):
         """Return the key corresponding to the fingerprint 'fpr'"""
+        cache = self._key_cache
+        if cache != None:
+            key = cache.get(fpr, secret)
+            if key != None:
+                return key
         ptr = pygpgme.new_gpgme_key_t_p()
         errorcheck(pygpgme.gpgme_get_key(self.wrapped, fpr, ptr, secret))
         key = pygpgme.gpgme_key_t_p_value(ptr)
         pygpgme.delete_gpgme_key_t_p(ptr)
         if key:
             key.__del__ = lambda self: pygpgme.gpgme_key_unref(self)
+            if cache != None:
+                cache.put(fpr, secret, key)
             return key
 
     def op_trustlist_all(self, *args, **kwargs):
@@ -128,6 +219,7 @@ class Context(GpgmeWrapper):
         """Returns the next trust item in the list created
         by a call to op_trustlist_start().  The object returned
         is of type TrustItem."""
+        self._check_deadline()
         ptr = pygpgme.new_gpgme_trust_item_t_p()
         try:
             errorcheck(pygpgme.gpgme_op_trustlist_next(self.wrapped, ptr))
@@ -182,6 +274,137 @@ class Context(GpgmeWrapper):
                 hookdata = (func, hook)
         pygpgme.pygpgme_set_progress_cb(self.wrapped, hookdata, self.last_progresscb)
 
+    def set_io_cbs(self, handler):
+        """Makes the context run its asynchronous (op_*_start) operations
+        on an external event loop instead of through wait().
+
+        handler must provide three methods:
+        add(fd, dir, tag), called when gpgme wants to be told about fd
+        becoming readable (dir is 1) or writable (dir is 0);
+        remove(tag), called when fd is no longer of interest;
+        event(type, err), called with one of the pyme.constants.event
+        values; for DONE err is the status of the finished operation.
+
+        Once fd is ready the event loop must call
+        pygpgme.pygpgme_io_dispatch(tag).  Pass None to return to gpgme's
+        own event loop.  See pyme.aio for an asyncio handler."""
+        self._free_iocb()
+        if handler != None:
+            self.last_iocb = pygpgme.new_PyObject_p_p()
+        pygpgme.pygpgme_set_io_cbs(self.wrapped, handler, self.last_iocb)
+
+    def encrypt_async(self, recp, flags, plain, cipher):
+        """Coroutine running op_encrypt() on the current asyncio event
+        loop."""
+        from . import aio
+        return aio.run(self, 'op_encrypt', recp, flags, plain, cipher)
+
+    def encrypt_sign_async(self, recp, flags, plain, cipher):
+        """Coroutine running op_encrypt_sign() on the current asyncio
+        event loop."""
+        from . import aio
+        return aio.run(self, 'op_encrypt_sign', recp, flags, plain, cipher)
+
+    def decrypt_async(self, cipher, plain):
+        """Coroutine running op_decrypt() on the current asyncio event
+        loop."""
+        from . import aio
+        return aio.run(self, 'op_decrypt', cipher, plain)
+
+    def decrypt_verify_async(self, cipher, plain):
+        """Coroutine running op_decrypt_verify() on the current asyncio
+        event loop."""
+        from . import aio
+        return aio.run(self, 'op_decrypt_verify', cipher, plain)
+
+    def sign_async(self, plain, sig, mode):
+        """Coroutine running op_sign() on the current asyncio event
+        loop."""
+        from . import aio
+        return aio.run(self, 'op_sign', plain, sig, mode)
+
+    def verify_async(self, sig, signed_text, plaintext):
+        """Coroutine running op_verify() on the current asyncio event
+        loop."""
+        from . import aio
+        return aio.run(self, 'op_verify', sig, signed_text, plaintext)
+
+    def encrypt_many(self, messages, recipients, flags = 0, sinks = None):
+        """Generator encrypting each plaintext of the iterable messages to
+        the keys in recipients (a list of keys or a RecipientSet), which
+        are converted only once for the whole batch.  Messages may be Data
+        objects or buffers (used without copying).
+
+        Yields a (ciphertext, error) tuple per message, in order.  The
+        ciphertext is returned as a string, or if sinks (an iterable of
+        Data objects matching messages) is given it is written to the
+        corresponding sink, which is yielded instead.  If a message can
+        not be encrypted, ciphertext is None and error is the exception
+        (usually a GPGMEError; a None message gives a ValueError); the
+        remaining messages are still processed.  ValueError is raised once
+        messages and sinks turn out to differ in length."""
+        if not isinstance(recipients, RecipientSet):
+            recipients = RecipientSet(recipients, False)
+        if sinks == None:
+            pairs = zip(messages, itertools.repeat(None))
+        else:
+            pairs = itertools.zip_longest(messages, sinks,
+                                          fillvalue=_missing)
+        for message, sink in pairs:
+            if message is _missing or sink is _missing:
+                raise ValueError("encrypt_many: messages and sinks differ "
+                                 "in length")
+            self._check_deadline()
+            try:
+                if message == None:
+                    raise ValueError("encrypt_many: message is None")
+                if isinstance(message, Data):
+                    plain = message
+                else:
+                    plain = Data(message, copy=False)
+                if sink == None:
+                    cipher = Data()
+                else:
+                    cipher = sink
+                errorcheck(pygpgme.gpgme_op_encrypt(self.wrapped, recipients,
+                                                    flags, plain, cipher),
+                           "Invocation of gpgme_op_encrypt")
+            except Exception as excp:
+                yield (None, excp)
+                continue
+            if sink == None:
+                cipher.seek(0, os.SEEK_SET)
+                yield (cipher.read(), None)
+            else:
+                yield (sink, None)
+
+    def op_verify_records(self):
+        """Returns the signatures checked by the last verify operation as a
+        list of SignatureRecord objects.  Unlike op_verify_result(), the
+        records are built in one pass in C and stay valid after the next
+        operation on the context."""
+        return pygpgme.pygpgme_verify_result_records(self.wrapped,
+                                                     SignatureRecord)
+
+    def op_decrypt_record(self):
+        """Returns the result of the last decrypt operation as a
+        DecryptRecord, or None if there is none.  The record stays valid
+        after the next operation on the context."""
+        result = self.op_decrypt_result()
+        if result == None:
+            return None
+        recipients = tuple([(recp.keyid, recp.pubkey_algo, recp.status)
+                            for recp in result.recipients])
+        return DecryptRecord(result.unsupported_algorithm,
+                             bool(result.wrong_key_usage), result.file_name,
+                             recipients)
+
+    def set_signers(self, signers):
+        """Replaces the signers of the context with the keys in signers, a
+        list of keys or a SignerSet, in a single call."""
+        errorcheck(pygpgme.pygpgme_signers_set(self.wrapped, signers),
+                   "Invocation of pygpgme_signers_set")
+
     def get_engine_info(self):
         """Returns this context specific engine info"""
         return pygpgme.gpgme_ctx_get_engine_info(self.wrapped)
@@ -206,20 +429,201 @@ class Context(GpgmeWrapper):
         context = pygpgme.gpgme_wait(self.wrapped, ptr, hang)
         status = pygpgme.gpgme_error_t_p_value(ptr)
         pygpgme.delete_gpgme_error_t_p(ptr)
-        
+
+        if context != None or status:
+            self._operation_done()
         if context == None:
             errorcheck(status)
             return None
         else:
             return status
 
+    def cancel(self):
+        """Cancels the pending asynchronous operation of the context.  Must
+        be called from the thread running the operation's event loop; use
+        cancel_async() from any other thread."""
+        errorcheck(pygpgme.gpgme_cancel(self.wrapped))
+
+    def cancel_async(self):
+        """Requests cancellation of the operation currently running in the
+        context.  Safe to call from any thread; the operation returns with
+        a GPGMEError of code errors.CANCELED shortly after."""
+        errorcheck(pygpgme.gpgme_cancel_async(self.wrapped))
+
+    def _check_deadline(self):
+        deadline = self._deadline
+        if deadline != None and deadline[0]:
+            raise errors.OperationTimeout(errors.CANCELED,
+                    "Deadline of %s seconds exceeded" % deadline[1],
+                    deadline[1])
+
+    @contextmanager
+    def deadline(self, timeout):
+        """Context manager bounding the whole with block to timeout
+        seconds.  Once the deadline passes the running operation is
+        cancelled and errors.OperationTimeout is raised:
+
+            with ctx.deadline(30):
+                ctx.op_decrypt(cipher, plain)
+
+        gpgme forgets a cancellation when the next operation starts, so
+        operations of the context started after the deadline, and
+        leaving the block, raise OperationTimeout as well.  A deadline
+        passing just as an operation starts is only noticed once that
+        operation has returned."""
+        expired = []
+        def expire():
+            expired.append(True)
+            pygpgme.gpgme_cancel_async(self.wrapped)
+        outer = self._deadline
+        self._deadline = (expired, timeout)
+        timer = threading.Timer(timeout, expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            yield self
+        except errors.OperationTimeout:
+            raise
+        except errors.GPGMEError as excp:
+            if expired and excp.getcode() == errors.CANCELED:
+                raise errors.OperationTimeout(excp.error,
+                        "Deadline of %s seconds exceeded" % timeout, timeout)
+            raise
+        else:
+            self._check_deadline()
+        finally:
+            timer.cancel()
+            self._deadline = outer
+
     def op_edit(self, key, func, fnc_value, out):
         """Start key editing using supplied callback function"""
         if key == None:
             raise ValueError("op_edit: First argument cannot be None")
         opaquedata = (func, fnc_value)
-        errorcheck(pygpgme.gpgme_op_edit(self.wrapped, key, opaquedata, out))
+        self._check_deadline()
+        try:
+            errorcheck(pygpgme.gpgme_op_edit(self.wrapped, key, opaquedata, out))
+        finally:
+            if self._key_cache != None:
+                self._key_cache.clear()
     
+class SignatureRecord(collections.namedtuple('SignatureRecord',
+                            'fpr status summary timestamp validity')):
+    """Compact, picklable summary of one verified signature: fingerprint,
+    status (an error value, 0 if the signature is good), summary (a
+    combination of pyme.constants.sigsum bits), timestamp and validity
+    (a pyme.constants.validity value)."""
+    __slots__ = ()
+
+class DecryptRecord(collections.namedtuple('DecryptRecord',
+                            'unsupported_algorithm wrong_key_usage file_name '
+                            'recipients')):
+    """Compact, picklable summary of a decrypt result.  recipients is a
+    tuple of (keyid, pubkey_algo, status) tuples."""
+    __slots__ = ()
+
+class SubKeySnapshot(collections.namedtuple('SubKeySnapshot',
+                            'fpr keyid pubkey_algo length timestamp expires '
+                            'revoked expired disabled invalid can_encrypt '
+                            'can_sign can_certify can_authenticate secret '
+                            'is_qualified')):
+    """Immutable copy of a subkey, see KeySnapshot."""
+    __slots__ = ()
+
+class UserIDSnapshot(collections.namedtuple('UserIDSnapshot',
+                            'uid name email comment validity revoked '
+                            'invalid')):
+    """Immutable copy of a user ID, see KeySnapshot."""
+    __slots__ = ()
+
+class KeySnapshot(collections.namedtuple('KeySnapshot',
+                            'fpr protocol owner_trust revoked expired '
+                            'disabled invalid can_encrypt can_sign '
+                            'can_certify can_authenticate secret '
+                            'is_qualified last_update subkeys uids')):
+    """Immutable copy of a key as returned by Key.snapshot() and
+    Context.op_keylist_snapshots().  subkeys and uids are tuples of
+    SubKeySnapshot and UserIDSnapshot objects.  Unlike Key objects,
+    snapshots hold no reference to GPGME memory, read their fields
+    without going through the wrapper, and can be hashed, compared and
+    pickled.  last_update is 0 if GPGME does not provide it."""
+    __slots__ = ()
+
+    @property
+    def keyid(self):
+        """The key ID of the primary key."""
+        if self.subkeys:
+            return self.subkeys[0].keyid
+        return None
+
+def key_snapshot(key):
+    """Returns a KeySnapshot of key."""
+    return pygpgme.pygpgme_key_snapshot(key, KeySnapshot, SubKeySnapshot,
+                                        UserIDSnapshot)
+
+class KeySet(object):
+    """Immutable set of keys converted once to the NULL-terminated key
+    array used by GPGME, holding a reference to every key.  Not to be
+    instantiated directly; see RecipientSet and SignerSet."""
+
+    capability = None
+    usage = None
+
+    def __init__(self, keys, check = True):
+        """Builds the set from the sequence keys.  Unless check is False,
+        every key is validated to be usable for the purpose of the set
+        and ValueError is raised otherwise."""
+        self.wrapped = None
+        self.keys = tuple(keys)
+        if check:
+            for key in self.keys:
+                self._check(key)
+        if self.keys:
+            self.wrapped = pygpgme.pygpgme_key_array_new(list(self.keys))
+            if self.wrapped == None:
+                raise MemoryError("%s: can not allocate key array" %
+                                  self.__class__.__name__)
+
+    def __del__(self):
+        if self.wrapped != None:
+            pygpgme.pygpgme_key_array_free(self.wrapped)
+            self.wrapped = None
+
+    def _check(self, key):
+        fpr = key.subkeys[0].fpr
+        for flag in ('revoked', 'expired', 'disabled', 'invalid'):
+            if getattr(key, flag):
+                raise ValueError("Key %s is %s" % (fpr, flag))
+        if not getattr(key, self.capability):
+            raise ValueError("Key %s can not be used for %s" %
+                             (fpr, self.usage))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        return iter(self.keys)
+
+    def __repr__(self):
+        return '<%s.%s of %d keys>' % (__name__, self.__class__.__name__,
+                                       len(self.keys))
+
+class RecipientSet(KeySet):
+    """A KeySet of encryption keys.  It can be passed to op_encrypt(),
+    op_encrypt_sign() and encrypt_many() in place of a list of keys.
+    An empty set stands for symmetric encryption."""
+    capability = 'can_encrypt'
+    usage = 'encryption'
+
+class SignerSet(KeySet):
+    """A KeySet of signing keys, applied to a Context with apply()."""
+    capability = 'can_sign'
+    usage = 'signing'
+
+    def apply(self, ctx):
+        """Makes the keys of the set the only signers of Context ctx."""
+        ctx.set_signers(self)
+
 class Data(GpgmeWrapper):
     """From the GPGME C manual:
 
@@ -249,40 +653,69 @@ class Data(GpgmeWrapper):
         return 1
     
     def __init__(self, string = None, file = None, offset = None,
-                 length = None, cbs = None):
+                 length = None, cbs = None, copy = True, spool = None,
+                 sink = False):
         """Initialize a new gpgme_data_t object.
 
         If no args are specified, make it an empty object.
 
         If string alone is specified, initialize it with the data
-        contained there.
+        contained there.  With copy set to False, string may be any
+        object supporting the buffer protocol (bytes, bytearray,
+        memoryview, mmap) and its memory is used directly instead of
+        being duplicated; the object is kept pinned until the Data
+        object is released.
 
         If file, offset, and length are all specified, file must
         be either a filename or a file-like object, and the object
         will be initialized by reading the specified chunk from the file.
 
-        If cbs is specified, it MUST be a tuple of the form:
+        If cbs is specified, it MUST be either a file-like object (see
+        new_from_fileobj()) or a tuple of the form:
 
         ((read_cb, write_cb, seek_cb, release_cb), hook)
 
-        where func is a callback function taking two arguments (count,
-        hook) and returning a string of read data, or None on EOF.
-        This will supply the read() method for the system.
+        where read_cb(size, hook) returns at most size bytes of data, or
+        an empty string or None on EOF; write_cb(buffer, hook) returns the
+        number of bytes it consumed from buffer; seek_cb(offset, whence,
+        hook) returns the new position and release_cb(hook) is called
+        when the object is released.  Any of them may be None.
 
         If file is specified without any other arguments, then
         it must be a filename, and the object will be initialized from
-        that file.
+        that file.  With copy set to False the file (a filename or a file
+        object) is memory mapped instead of being read into memory.
+
+        If spool is specified, make it an empty object which keeps its
+        content in memory up to spool bytes and moves it to a temporary
+        file once it grows beyond that.
+
+        If sink is True, make it an empty memory object which reset()
+        empties in place, see new_sink().
 
         Any other use will result in undefined or erroneous behavior."""
         self.wrapped = None
         self.last_readcb = None
+        self.last_buffer = None
+        self.last_mapping = None
+        self.last_file = None
+        self.last_sink = None
 
         if cbs != None:
-            self.new_from_cbs(*cbs)
+            if type(cbs) == tuple:
+                self.new_from_cbs(*cbs)
+            else:
+                self.new_from_fileobj(cbs)
         elif string != None:
-            self.new_from_mem(string)
+            self.new_from_mem(string, copy)
         elif file != None and offset != None and length != None:
             self.new_from_filepart(file, offset, length)
+        elif spool != None:
+            self.new_spooled(spool)
+        elif sink:
+            self.new_sink()
+        elif file != None and not copy:
+            self.new_from_mmap(file)
         elif file != None:
             if type(file) == type("x"):
                 self.new_from_file(file)
@@ -295,6 +728,16 @@ class Data(GpgmeWrapper):
         if self.wrapped != None:
             pygpgme.gpgme_data_release(self.wrapped)
         self._free_readcb()
+        self._free_buffer()
+        self._free_mapping()
+        self._free_sink()
+        self.last_file = None
+
+    def _free_sink(self):
+        if self.last_sink != None:
+            pygpgme.pygpgme_clear_generic_cb(self.last_sink)
+            pygpgme.delete_PyObject_p_p(self.last_sink)
+            self.last_sink = None
 
     def _free_readcb(self):
         if self.last_readcb != None:
@@ -302,34 +745,148 @@ class Data(GpgmeWrapper):
             pygpgme.delete_PyObject_p_p(self.last_readcb)
             self.last_readcb = None
 
+    def _free_buffer(self):
+        if self.last_buffer != None:
+            self.last_buffer.release()
+            self.last_buffer = None
+
+    def _free_mapping(self):
+        if self.last_mapping != None:
+            self.last_mapping.close()
+            self.last_mapping = None
+
     def new(self):
         tmp = pygpgme.new_gpgme_data_t_p()
         errorcheck(pygpgme.gpgme_data_new(tmp))
         self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
         pygpgme.delete_gpgme_data_t_p(tmp)
 
+    def new_sink(self):
+        """Makes the object an empty memory object meant as operation
+        output.  Unlike new(), its buffer is managed by pyme, so reset()
+        empties it in place and keeps the memory for the next use, without
+        creating a new gpgme data object.  Reading and writing it does not
+        involve Python code."""
+        tmp = pygpgme.new_gpgme_data_t_p()
+        self._free_sink()
+        self.last_sink = pygpgme.new_PyObject_p_p()
+        try:
+            errorcheck(pygpgme.pygpgme_data_new_sink(tmp, self.last_sink))
+            self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
+        except:
+            self._free_sink()
+            raise
+        finally:
+            pygpgme.delete_gpgme_data_t_p(tmp)
+
     def new_from_mem(self, string, copy = 1):
+        if not copy:
+            self.new_from_buffer(string)
+            return
         tmp = pygpgme.new_gpgme_data_t_p()
         errorcheck(pygpgme.gpgme_data_new_from_mem(tmp,string,len(string),copy))
         self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
         pygpgme.delete_gpgme_data_t_p(tmp)
+        self._hint_size(len(string))
+
+    def new_from_buffer(self, buffer):
+        """Initialize the object with the memory of buffer without copying
+        it.  buffer may be any object supporting the buffer protocol with a
+        contiguous layout, like bytes, bytearray, memoryview or mmap.  A
+        view of it is held until the object is released, so a bytearray
+        can not be resized and an mmap can not be closed meanwhile."""
+        view = memoryview(buffer).cast('B')
+        tmp = pygpgme.new_gpgme_data_t_p()
+        try:
+            errorcheck(pygpgme.pygpgme_data_new_from_buffer(tmp, view))
+        except:
+            view.release()
+            pygpgme.delete_gpgme_data_t_p(tmp)
+            raise
+        self._free_buffer()
+        self.last_buffer = view
+        self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
+        pygpgme.delete_gpgme_data_t_p(tmp)
+        self._hint_size(view.nbytes)
+
+    def new_from_mmap(self, file):
+        """Initialize the object with a read-only memory mapping of a file.
+        The argument "file" may be a file name or a file-like object
+        supporting the fileno() call.
+
+        The mapping is handed to gpgme without copying, so the file is
+        paged in as gpgme reads it and the pages can be dropped again by
+        the kernel.  The file must not be truncated while the object
+        is alive."""
+        if type(file) == type("x"):
+            fp = open(file, 'rb')
+            try:
+                fd = fp.fileno()
+                if os.fstat(fd).st_size == 0:
+                    self.new_from_mem(b'')
+                    return
+                mapping = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+            finally:
+                fp.close()
+        else:
+            fd = file.fileno()
+            if os.fstat(fd).st_size == 0:
+                self.new_from_mem(b'')
+                return
+            mapping = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+        if hasattr(mapping, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+        try:
+            self.new_from_buffer(mapping)
+        except:
+            mapping.close()
+            raise
+        self._free_mapping()
+        self.last_mapping = mapping
 
     def new_from_file(self, filename, copy = 1):
         tmp = pygpgme.new_gpgme_data_t_p()
         errorcheck(pygpgme.gpgme_data_new_from_file(tmp, filename, copy))
         self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
         pygpgme.delete_gpgme_data_t_p(tmp)
+        self._hint_size(os.stat(filename).st_size)
 
     def new_from_cbs(self, funcs, hook):
         """Argument funcs must be a 4 element tuple with callbacks:
         (read_cb, write_cb, seek_cb, release_cb)"""
+        self._new_from_cbs((tuple(funcs), hook))
+
+    def new_from_fileobj(self, file):
+        """Initialize the object to read from and write to the file-like
+        object file.  gpgme calls its readinto() (or read()), write() and
+        seek() methods directly, passing memoryviews of its own buffers,
+        so sockets, pipes and other streams can be used without loading
+        their content in memory."""
+        self._new_from_cbs(file)
+        self.last_file = file
+
+    def new_spooled(self, max_size, dir = None):
+        """Initialize an empty object whose content is held in memory until
+        it exceeds max_size bytes and is then transparently moved to a
+        temporary file in dir (or the default temporary directory).  Reading
+        and seeking behave the same in both cases."""
+        self.new_from_fileobj(tempfile.SpooledTemporaryFile(max_size,
+                                                            'w+b', dir=dir))
+
+    def _new_from_cbs(self, hookdata):
         tmp = pygpgme.new_gpgme_data_t_p()
         self._free_readcb()
         self.last_readcb = pygpgme.new_PyObject_p_p()
-        hookdata = (funcs, hook)
-        pygpgme.pygpgme_data_new_from_cbs(tmp, hookdata, self.last_readcb)
-        self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
-        pygpgme.delete_gpgme_data_t_p(tmp)
+        try:
+            errorcheck(pygpgme.pygpgme_data_new_from_cbs(tmp, hookdata,
+                                                         self.last_readcb))
+            self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
+        except:
+            self._free_readcb()
+            raise
+        finally:
+            pygpgme.delete_gpgme_data_t_p(tmp)
 
     def new_from_filepart(self, file, offset, length):
         """This wraps the GPGME gpgme_data_new_from_filepart() function.
@@ -355,20 +912,29 @@ class Data(GpgmeWrapper):
                                                       offset, length))
         self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
         pygpgme.delete_gpgme_data_t_p(tmp)
+        self._hint_size(length)
 
     def new_from_fd(self, file):
         """This wraps the GPGME gpgme_data_new_from_fd() function.
-        The argument "file" may be a file-like object, supporting the fileno()
-        call and the mode attribute."""
+        The argument "file" may be an integer file descriptor or a file-like
+        object supporting the fileno() call.  The descriptor is used
+        directly by gpgme without any stdio buffering; a file-like object
+        is kept referenced so that it is not closed while in use."""
         
+        if type(file) == int:
+            fd = file
+        else:
+            fd = file.fileno()
         tmp = pygpgme.new_gpgme_data_t_p()
-        fp = pygpgme.fdopen(file.fileno(), file.mode)
-        if fp == None:
-            raise ValueError("Failed to open file from %s arg %s" % \
-                  (str(type(file)), str(file)))
-        errorcheck(gpgme_data_new_from_fd(tmp, fp))
-        self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
-        pygpgme.delete_gpgme_data_t_p(tmp)
+        try:
+            errorcheck(pygpgme.gpgme_data_new_from_fd(tmp, fd))
+            self.wrapped = pygpgme.gpgme_data_t_p_value(tmp)
+        finally:
+            pygpgme.delete_gpgme_data_t_p(tmp)
+        self.last_file = file
+        st = os.fstat(fd)
+        if stat.S_ISREG(st.st_mode):
+            self._hint_size(st.st_size)
 
     def new_from_stream(self, file):
         """This wrap around gpgme_data_new_from_stream is an alias for
@@ -376,6 +942,77 @@ class Data(GpgmeWrapper):
         between file stream and file descriptor"""
         self.new_from_fd(file)
     
+    def set_flag(self, name, value):
+        """Sets the gpgme data flag name (for instance "size-hint") to
+        value.  Both are converted to strings."""
+        errorcheck(pygpgme.gpgme_data_set_flag(self.wrapped,
+                                               str(name).encode('ascii'),
+                                               str(value).encode('ascii')))
+
+    def set_size_hint(self, size):
+        """Tells the engine the expected total size of the data so it can
+        preallocate buffers and report correct progress totals."""
+        self.set_flag("size-hint", int(size))
+
+    def _hint_size(self, size):
+        # Used by the constructors: older gpgme versions without data flags
+        # simply do without the hint.
+        try:
+            self.set_size_hint(size)
+        except (AttributeError, errors.GPGMEError):
+            pass
+
+    def get_file_name(self):
+        return pygpgme.gpgme_data_get_file_name(self.wrapped)
+
+    def set_file_name(self, file_name):
+        """Sets the file name stored with the data, for instance in the
+        literal data packet of an OpenPGP message.  None clears it."""
+        if file_name != None and type(file_name) != bytes:
+            file_name = os.fsencode(file_name)
+        errorcheck(pygpgme.gpgme_data_set_file_name(self.wrapped, file_name))
+
+    file_name = property(get_file_name, set_file_name)
+
+    def get_encoding(self):
+        return pygpgme.gpgme_data_get_encoding(self.wrapped)
+
+    def set_encoding(self, encoding):
+        """Sets the encoding of the data, one of the constants in
+        pyme.constants.data.encoding."""
+        errorcheck(pygpgme.gpgme_data_set_encoding(self.wrapped, encoding))
+
+    encoding = property(get_encoding, set_encoding)
+
+    def reset(self):
+        """Empty the object and rewind it so that it can be reused, for
+        instance as the output of another operation.
+
+        Sinks (see new_sink()) and objects backed by a file-like object
+        (see new_from_fileobj() and new_spooled()) are truncated in place.
+        gpgme has no way to empty its own memory objects, so any other
+        object has its gpgme data object released and re-created."""
+        if self.last_sink != None or \
+               (self.last_readcb != None and self.last_file != None):
+            if self.last_sink != None:
+                pygpgme.pygpgme_data_sink_reset(self.last_sink)
+            else:
+                self.last_file.seek(0, os.SEEK_SET)
+                self.last_file.truncate(0)
+            pygpgme.gpgme_data_seek(self.wrapped, 0, os.SEEK_SET)
+            pygpgme.gpgme_data_set_encoding(self.wrapped,
+                                            pygpgme.GPGME_DATA_ENCODING_NONE)
+            pygpgme.gpgme_data_set_file_name(self.wrapped, None)
+        else:
+            old = self.wrapped
+            self.new()
+            if old != None:
+                pygpgme.gpgme_data_release(old)
+            self._free_readcb()
+            self._free_buffer()
+            self._free_mapping()
+            self.last_file = None
+
     def write(self, buffer):
         errorcheck(pygpgme.gpgme_data_write(self.wrapped, buffer, len(buffer)))
 
@@ -388,18 +1025,63 @@ class Data(GpgmeWrapper):
         to read before EOF was reached."""
         
         if size == 0:
-            return ''
+            return b''
 
         if size > 0:
             return pygpgme.gpgme_data_read(self.wrapped, size)
         else:
-            retval = ''
+            # When the remaining size is known, read it straight into a
+            # single bytes object of that size so large data is neither
+            # copied twice nor reassembled chunk by chunk.
+            chunks = []
+            remaining = self._remaining()
+            if remaining != None and remaining > 0:
+                chunks.append(pygpgme.pygpgme_data_read_all(self.wrapped,
+                                                            remaining))
+            remaining = 10240
             while 1:
-                result = pygpgme.gpgme_data_read(self.wrapped, 10240)
+                result = pygpgme.gpgme_data_read(self.wrapped, remaining)
                 if len(result) == 0:
                     break
-                retval += result
-            return retval
+                chunks.append(result)
+                remaining = 10240
+            if len(chunks) == 1:
+                return chunks[0]
+            return b''.join(chunks)
+
+    def readinto(self, buffer):
+        """Read up to len(buffer) bytes directly into buffer, which must be
+        a writable object supporting the buffer protocol (bytearray,
+        memoryview, mmap, array, ...).
+
+        Returns the number of bytes read, 0 on EOF."""
+        return pygpgme.pygpgme_data_readinto(self.wrapped, buffer)
+
+    def iter_chunks(self, size = 10240):
+        """Generator returning the data from the current position to EOF
+        in chunks of at most size bytes."""
+        if size <= 0:
+            raise ValueError("iter_chunks: size must be positive")
+        while 1:
+            chunk = pygpgme.gpgme_data_read(self.wrapped, size)
+            if len(chunk) == 0:
+                break
+            yield chunk
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def _remaining(self):
+        """Returns the number of bytes between the current position and the
+        end of the data, or None if the data object can not be seeked."""
+        pos = pygpgme.gpgme_data_seek(self.wrapped, 0, os.SEEK_CUR)
+        if pos < 0:
+            return None
+        end = pygpgme.gpgme_data_seek(self.wrapped, 0, os.SEEK_END)
+        pygpgme.gpgme_data_seek(self.wrapped, pos, os.SEEK_SET)
+        if end < 0:
+            return None
+        return end - pos
 
 def pubkey_algo_name(algo):
     return pygpgme.gpgme_pubkey_algo_name(algo)
@@ -20,6 +20,9 @@ from . import pygpgme
 
 class GPGMEError(Exception):
     def __init__(self, error = None, message = None):
+        # Keep the arguments in args so that errors can be pickled, for
+        # instance to be passed back from worker processes.
+        Exception.__init__(self, error, message)
         self.error = error
         self.message = message
     
@@ -39,7 +42,16 @@ class GPGMEError(Exception):
     def __str__(self):
         return "%s (%d,%d)"%(self.getstring(), self.getsource(), self.getcode())
 
+class OperationTimeout(GPGMEError):
+    """Raised when an operation was cancelled because its deadline of
+    timeout seconds passed."""
+    def __init__(self, error = None, message = None, timeout = None):
+        GPGMEError.__init__(self, error, message)
+        self.args = (error, message, timeout)
+        self.timeout = timeout
+
 EOF = getattr(pygpgme, "EOF")
+CANCELED = getattr(pygpgme, "CANCELED")
 
 def errorcheck(retval, extradata = None):
     if retval:
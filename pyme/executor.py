@@ -0,0 +1,171 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""Running operations in a pool of worker processes.
+
+GPGME contexts can not be carried over os.fork(), so the CryptoExecutor
+initializes GPGME once in every worker process and creates the
+worker's Context there.  Keys are named by fingerprint and results come
+back as plain strings and records, which can be pickled:
+
+    with executor.CryptoExecutor(4, armor=True) as ex:
+        futures = [ex.sign(doc, [fpr], mode.DETACH) for doc in docs]
+        signatures = [future.result() for future in futures]
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from . import core
+
+# Per process state, set up by _initialize().
+_config = None
+_context = None
+
+def _forget_context():
+    """Drops the Context inherited over a fork without releasing the
+    parent's GPGME context."""
+    global _context
+    if _context != None:
+        _context.own = False
+        _context = None
+
+def _initialize(config):
+    global _config
+    _forget_context()
+    _config = config
+    core.check_version(None)
+    for category, value in config['locale']:
+        core.set_locale(category, value)
+    if config['engine_info'] != None:
+        core.set_engine_info(*config['engine_info'])
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_forget_context)
+
+def _get_context():
+    global _context
+    if _context == None:
+        ctx = core.Context()
+        if _config['protocol'] != None:
+            ctx.set_protocol(_config['protocol'])
+        if _config['armor'] != None:
+            ctx.set_armor(_config['armor'])
+        if _config['textmode'] != None:
+            ctx.set_textmode(_config['textmode'])
+        if _config['passphrase_cb'] != None:
+            ctx.set_passphrase_cb(*_config['passphrase_cb'])
+        _context = ctx
+    return _context
+
+def _get_keys(ctx, fprs, secret):
+    return [ctx.get_key(fpr.encode('ascii'), secret) for fpr in fprs]
+
+def _read(data):
+    data.seek(0, os.SEEK_SET)
+    return data.read()
+
+def _encrypt(plaintext, recipients, flags):
+    ctx = _get_context()
+    cipher = core.Data()
+    ctx.op_encrypt(_get_keys(ctx, recipients, 0), flags,
+                   core.Data(plaintext, copy=False), cipher)
+    return _read(cipher)
+
+def _sign(plaintext, signers, mode):
+    ctx = _get_context()
+    ctx.set_signers(_get_keys(ctx, signers, 1))
+    sig = core.Data()
+    ctx.op_sign(core.Data(plaintext, copy=False), sig, mode)
+    return _read(sig)
+
+def _decrypt(ciphertext, verify):
+    ctx = _get_context()
+    plain = core.Data()
+    if verify:
+        ctx.op_decrypt_verify(core.Data(ciphertext, copy=False), plain)
+        signatures = ctx.op_verify_records()
+    else:
+        ctx.op_decrypt(core.Data(ciphertext, copy=False), plain)
+        signatures = None
+    return (_read(plain), ctx.op_decrypt_record(), signatures)
+
+def _verify(sig, signed):
+    ctx = _get_context()
+    if signed == None:
+        ctx.op_verify(core.Data(sig, copy=False), None, core.Data())
+    else:
+        ctx.op_verify(core.Data(sig, copy=False),
+                      core.Data(signed, copy=False), None)
+    return ctx.op_verify_records()
+
+class CryptoExecutor(object):
+    """A pool of max_workers processes (os.cpu_count() if None) running
+    encryption, signing, decryption and verification, so that CPU heavy
+    work scales over several cores.
+
+    Every worker calls check_version(), set_locale() for each
+    (category, value) pair of locale and set_engine_info(*engine_info)
+    once, and then keeps a Context configured with protocol, armor and
+    textmode.  passphrase_cb, if given, must be a (function, hook) tuple
+    that can be pickled.  mp_context selects the multiprocessing start
+    method.
+
+    The methods return concurrent.futures.Future objects; failures are
+    raised from their result() as GPGMEError."""
+
+    def __init__(self, max_workers = None, protocol = None, armor = None,
+                 textmode = None, engine_info = None, locale = (),
+                 passphrase_cb = None, mp_context = None):
+        config = {'protocol': protocol, 'armor': armor,
+                  'textmode': textmode, 'engine_info': engine_info,
+                  'locale': tuple(locale), 'passphrase_cb': passphrase_cb}
+        self._executor = ProcessPoolExecutor(max_workers, mp_context,
+                                             _initialize, (config,))
+
+    def encrypt(self, plaintext, recipients, flags = 0):
+        """Encrypts the string plaintext to the keys with the fingerprints
+        in recipients.  The Future returns the ciphertext."""
+        return self._executor.submit(_encrypt, plaintext, tuple(recipients),
+                                     flags)
+
+    def sign(self, plaintext, signers, mode):
+        """Signs the string plaintext with the secret keys with the
+        fingerprints in signers, using one of the pyme.constants.sig.mode
+        values.  The Future returns the signature or signed message."""
+        return self._executor.submit(_sign, plaintext, tuple(signers), mode)
+
+    def decrypt(self, ciphertext, verify = True):
+        """Decrypts the string ciphertext, checking signatures too if verify
+        is set.  The Future returns a (plaintext, core.DecryptRecord,
+        signatures) tuple, signatures being a list of core.SignatureRecord
+        or None."""
+        return self._executor.submit(_decrypt, ciphertext, verify)
+
+    def verify(self, sig, signed = None):
+        """Verifies the signature sig over the string signed, or the signed
+        message sig if signed is None.  The Future returns a list of
+        core.SignatureRecord."""
+        return self._executor.submit(_verify, sig, signed)
+
+    def shutdown(self, wait = True):
+        self._executor.shutdown(wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        return False
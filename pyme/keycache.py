@@ -0,0 +1,77 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""Caching of key lookups.
+
+A KeyCache attached to a Context with Context.set_key_cache() answers
+repeated Context.get_key() calls without running a keylist on the
+engine.  One cache should be shared by all contexts using the same
+keyring: operations changing the keyring (op_import, op_delete,
+op_edit, op_genkey and the like) on any of them clear it."""
+
+import time
+import threading
+from collections import OrderedDict
+
+class KeyCache(object):
+    """Least recently used cache of keys indexed by (fingerprint, secret).
+
+    At most maxsize keys are kept and, if ttl is not None, entries older
+    than ttl seconds are treated as missing.  The cache may be shared
+    between threads."""
+
+    def __init__(self, maxsize = 1024, ttl = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def _index(self, fpr, secret):
+        if type(fpr) == bytes:
+            fpr = fpr.decode('ascii')
+        return (fpr.upper(), bool(secret))
+
+    def get(self, fpr, secret):
+        """Returns the cached key or None."""
+        index = self._index(fpr, secret)
+        with self._lock:
+            entry = self._entries.get(index)
+            if entry == None:
+                return None
+            key, stamp = entry
+            if self.ttl != None and time.monotonic() - stamp > self.ttl:
+                del self._entries[index]
+                return None
+            self._entries.move_to_end(index)
+            return key
+
+    def put(self, fpr, secret, key):
+        """Stores key, evicting the least recently used entry if full."""
+        index = self._index(fpr, secret)
+        with self._lock:
+            self._entries[index] = (key, time.monotonic())
+            self._entries.move_to_end(index)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(False)
+
+    def clear(self):
+        """Forgets all keys, for instance after the keyring changed."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
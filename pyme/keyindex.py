@@ -0,0 +1,447 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""In-memory index of a keyring.
+
+A KeyIndex lists the keyring once through the keylist API and then
+answers lookups by fingerprint, key ID, email address or UID word from
+dictionaries, without running the engine:
+
+    ctx = core.Context()
+    index = keyindex.KeyIndex(ctx)
+    for entry in index.lookup('alice@example.org'):
+        key = ctx.get_key(entry.fpr.encode('ascii'), 0)
+
+Entries are KeyEntry records holding the key's metadata; use
+Context.get_key() (possibly with a keycache.KeyCache) to get the key
+itself.  Like other strings passed to gpgme, the fingerprint has to be
+given to it as bytes.
+
+Other processes may change the keyring meanwhile.  KeyIndex.sync()
+uses a KeyringWatcher to notice that from the keyring files and then
+updates only the entries of keys which changed.
+
+A KeyIndexFile keeps the index in an SQLite database, so that new
+processes can answer lookups right away instead of listing the keyring
+first.  It records the state of the keyring files it was built from to
+detect when it is stale."""
+
+import os
+import re
+import json
+import sqlite3
+import collections
+
+class KeyEntry(collections.namedtuple('KeyEntry',
+                                      'fpr keyid subkeys uids emails '
+                                      'last_update can_encrypt can_sign '
+                                      'revoked expired disabled invalid '
+                                      'secret')):
+    """Metadata of one key: primary fingerprint and long key ID, a tuple
+    of the fingerprints of all subkeys (the primary key first), tuples of
+    user ID strings and normalized email addresses, the last_update
+    time (0 if unknown) and the capability and status flags."""
+    __slots__ = ()
+
+    @classmethod
+    def from_key(cls, key):
+        """Builds the entry for a key returned by the keylist API or for
+        its KeySnapshot."""
+        subkeys = key.subkeys
+        uids = key.uids
+        return cls(subkeys[0].fpr, subkeys[0].keyid,
+                   tuple([subkey.fpr for subkey in subkeys]),
+                   tuple([uid.uid for uid in uids]),
+                   tuple([normalize_email(uid.email) for uid in uids
+                          if uid.email]),
+                   getattr(key, 'last_update', 0),
+                   bool(key.can_encrypt), bool(key.can_sign),
+                   bool(key.revoked), bool(key.expired), bool(key.disabled),
+                   bool(key.invalid), bool(key.secret))
+
+_token_re = re.compile(r'\w+', re.UNICODE)
+
+def normalize_email(email):
+    """Returns email lowercased and without surrounding spaces and angle
+    brackets."""
+    return email.strip().strip('<>').strip().lower()
+
+def uid_tokens(uid):
+    """Returns the set of lowercased words of the user ID string uid."""
+    return set([token.lower() for token in _token_re.findall(uid)])
+
+def home_dir(ctx):
+    """Returns the configuration directory of the engine used by the
+    Context ctx."""
+    protocol = ctx.get_protocol()
+    for info in ctx.get_engine_info():
+        if info.protocol == protocol and info.home_dir:
+            return info.home_dir
+    if os.environ.get('GNUPGHOME'):
+        return os.environ['GNUPGHOME']
+    return os.path.expanduser('~/.gnupg')
+
+class KeyringWatcher(object):
+    """Notices changes of the keyring files in the engine configuration
+    directory home by comparing their modification time, size and inode
+    with those seen at the previous check.  inotify is not used, so a
+    check costs a handful of stat() calls."""
+
+    # keyboxd (GnuPG 2.3 and later with use-keyboxd) keeps public keys
+    # in an SQLite database whose writes may only reach its -wal file.
+    files = ('pubring.kbx', 'pubring.gpg', 'secring.gpg',
+             'private-keys-v1.d', 'trustdb.gpg', 'public-keys.d',
+             'public-keys.d/pubring.db', 'public-keys.d/pubring.db-wal')
+
+    def __init__(self, home, seen = None):
+        self.home = home
+        self.seen = seen
+
+    def state(self):
+        """Returns the current state of the keyring files, which can be
+        compared with a state returned earlier."""
+        state = []
+        for name in self.files:
+            try:
+                st = os.stat(os.path.join(self.home, name))
+                state.append((name, st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError:
+                state.append((name, None, None, None))
+        return tuple(state)
+
+    def changed(self):
+        """Returns True if the keyring changed since the previous call (or
+        if this is the first call) and remembers the current state as
+        seen."""
+        state = self.state()
+        if state == self.seen:
+            return False
+        self.seen = state
+        return True
+
+class _KeyLookup(object):
+    """Query dispatch shared by KeyIndex and KeyIndexFile."""
+
+    def lookup(self, query):
+        """Returns the entries matching query, which is interpreted as a
+        fingerprint, key ID, email address or UID word depending on its
+        form."""
+        query = query.strip()
+        hexid = query.upper()
+        if hexid.startswith('0X'):
+            hexid = hexid[2:]
+        if len(hexid) in (8, 16, 40) and \
+               re.match('^[0-9A-F]+$', hexid) != None:
+            if len(hexid) == 40:
+                entry = self.by_fingerprint(hexid)
+                if entry == None:
+                    return self.by_keyid(hexid[-16:])
+                return (entry,)
+            return self.by_keyid(hexid)
+        if '@' in query:
+            return self.by_email(query)
+        return self.by_token(query)
+
+class KeyIndex(_KeyLookup):
+    """Index of the keys of a keyring, built from a Context with load() or
+    given to the constructor.  If secret is True, secret keys are
+    listed instead of public keys.
+
+    Lookups return tuples of KeyEntry objects and never touch the
+    engine."""
+
+    def __init__(self, ctx = None, secret = False):
+        self.secret = secret
+        self.watcher = None
+        self.clear()
+        if ctx != None:
+            self.load(ctx)
+
+    def clear(self):
+        self.entries = {}
+        self._by_keyid = {}
+        self._by_email = {}
+        self._by_token = {}
+
+    def _watch(self, ctx):
+        """Points the watcher at the keyring of ctx and records the state
+        of its files as the one the index reflects.  Called before
+        listing, so that changes made while listing are noticed by the
+        next sync() and make a saved index stale."""
+        home = home_dir(ctx)
+        if self.watcher == None or self.watcher.home != home:
+            self.watcher = KeyringWatcher(home)
+        self.watcher.changed()
+
+    def load(self, ctx):
+        """Rebuilds the index by listing all keys with ctx."""
+        self._watch(ctx)
+        self.clear()
+        for key in ctx.op_keylist_snapshots(None, self.secret):
+            self.add(KeyEntry.from_key(key))
+
+    def refresh(self, ctx):
+        """Brings the index up to date with the keyring of ctx.  The keys
+        are listed again, but only those whose entry differs are filed
+        anew, and keys which are gone are dropped.  Returns the number of
+        entries added, updated and removed."""
+        self._watch(ctx)
+        added = updated = 0
+        seen = set()
+        for key in ctx.op_keylist_snapshots(None, self.secret):
+            entry = KeyEntry.from_key(key)
+            fpr = entry.fpr.upper()
+            seen.add(fpr)
+            old = self.entries.get(fpr)
+            if old == None:
+                added += 1
+            elif old != entry:
+                updated += 1
+            else:
+                continue
+            self.add(entry)
+        gone = [fpr for fpr in self.entries if fpr not in seen]
+        for fpr in gone:
+            self.remove(fpr)
+        return (added, updated, len(gone))
+
+    def save(self, path):
+        """Writes the index to the KeyIndexFile path, see
+        KeyIndexFile.save()."""
+        store = KeyIndexFile(path)
+        try:
+            store.save(self)
+        finally:
+            store.close()
+
+    def sync(self, ctx):
+        """Refreshes the index if the keyring files of the engine of ctx
+        changed since the index was last loaded or refreshed.  Returns
+        True if a refresh happened."""
+        watcher = self.watcher
+        if watcher != None and watcher.home == home_dir(ctx) and \
+               not watcher.changed():
+            return False
+        self.refresh(ctx)
+        return True
+
+    def _keys(self, entry):
+        """Yields (table, index) pairs under which entry is filed."""
+        for fpr in entry.subkeys:
+            if not fpr:
+                continue
+            fpr = fpr.upper()
+            yield (self._by_keyid, fpr[-16:])
+            yield (self._by_keyid, fpr[-8:])
+        for email in entry.emails:
+            yield (self._by_email, email)
+        for uid in entry.uids:
+            for token in uid_tokens(uid):
+                yield (self._by_token, token)
+
+    def add(self, entry):
+        """Adds or replaces entry."""
+        fpr = entry.fpr.upper()
+        if fpr in self.entries:
+            self.remove(fpr)
+        self.entries[fpr] = entry
+        for table, index in self._keys(entry):
+            table.setdefault(index, set()).add(fpr)
+
+    def remove(self, fpr):
+        """Removes the entry of the key with fingerprint fpr."""
+        entry = self.entries.pop(fpr.upper(), None)
+        if entry == None:
+            return
+        for table, index in self._keys(entry):
+            fprs = table.get(index)
+            if fprs != None:
+                fprs.discard(fpr.upper())
+                if not fprs:
+                    del table[index]
+
+    def _entries(self, fprs):
+        if not fprs:
+            return ()
+        return tuple([self.entries[fpr] for fpr in sorted(fprs)])
+
+    def by_fingerprint(self, fpr):
+        """Returns the entry of the key with fingerprint fpr, or None."""
+        return self.entries.get(fpr.upper())
+
+    def by_keyid(self, keyid):
+        """Returns the entries of the keys having a (sub)key with the long
+        or short key ID keyid."""
+        keyid = keyid.upper()
+        if keyid.startswith('0X'):
+            keyid = keyid[2:]
+        return self._entries(self._by_keyid.get(keyid))
+
+    def by_email(self, email):
+        """Returns the entries of the keys with a user ID for email."""
+        return self._entries(self._by_email.get(normalize_email(email)))
+
+    def by_token(self, token):
+        """Returns the entries of the keys with a user ID containing the
+        word token."""
+        return self._entries(self._by_token.get(token.lower()))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, fpr):
+        return fpr.upper() in self.entries
+
+class KeyIndexFile(_KeyLookup):
+    """A key index stored in the SQLite database path, created if missing.
+
+    Opening it takes no time regardless of the size of the keyring, and
+    lookups (the same as those of KeyIndex) are answered from indexed
+    tables.  Use save() or KeyIndex.save() to fill it, stale() to check
+    it against the keyring and sync() to bring it up to date."""
+
+    def __init__(self, path):
+        self.path = path
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY,
+                                             value TEXT);
+            CREATE TABLE IF NOT EXISTS keys (fpr TEXT PRIMARY KEY,
+                                             entry TEXT);
+            CREATE TABLE IF NOT EXISTS lookup (kind TEXT, value TEXT,
+                                               fpr TEXT);
+            CREATE INDEX IF NOT EXISTS lookup_index ON lookup (kind, value);
+            """)
+
+    def close(self):
+        self.db.close()
+
+    def _entry(self, text):
+        fields = json.loads(text)
+        for i in (2, 3, 4):
+            fields[i] = tuple(fields[i])
+        return KeyEntry(*fields)
+
+    def save(self, index):
+        """Replaces the content of the file with the KeyIndex index.  The
+        keyring state recorded by index when it was last loaded or
+        refreshed is stored along, so that the file becomes stale if the
+        keyring changed since then, even before saving.  An index which
+        was never loaded from a Context is saved as stale."""
+        if index.watcher != None:
+            home = index.watcher.home
+            state = index.watcher.seen
+        else:
+            home = state = None
+        with self.db:
+            self.db.execute("DELETE FROM meta")
+            self.db.execute("DELETE FROM keys")
+            self.db.execute("DELETE FROM lookup")
+            self.db.executemany("INSERT INTO meta VALUES (?, ?)",
+                                [('secret', json.dumps(index.secret)),
+                                 ('home', json.dumps(home)),
+                                 ('state', json.dumps(state))])
+            self.db.executemany("INSERT INTO keys VALUES (?, ?)",
+                                [(fpr, json.dumps(list(entry)))
+                                 for fpr, entry in index.entries.items()])
+            rows = []
+            for table, kind in ((index._by_keyid, 'keyid'),
+                                (index._by_email, 'email'),
+                                (index._by_token, 'token')):
+                for value, fprs in table.items():
+                    for fpr in fprs:
+                        rows.append((kind, value, fpr))
+            self.db.executemany("INSERT INTO lookup VALUES (?, ?, ?)", rows)
+
+    def load(self):
+        """Returns the stored index as a KeyIndex.  Its sync() refreshes it
+        only if the keyring changed since the recorded state."""
+        index = KeyIndex(secret=self._meta('secret') == True)
+        home = self._meta('home')
+        state = self._meta('state')
+        if home != None and state != None:
+            index.watcher = KeyringWatcher(home, tuple([tuple(item)
+                                                        for item in state]))
+        for (text,) in self.db.execute("SELECT entry FROM keys"):
+            index.add(self._entry(text))
+        return index
+
+    def _meta(self, name):
+        row = self.db.execute("SELECT value FROM meta WHERE name = ?",
+                              (name,)).fetchone()
+        if row == None:
+            return None
+        return json.loads(row[0])
+
+    def stale(self, ctx = None):
+        """Returns True if the keyring changed since the file was saved,
+        or if that can not be told.  The keyring is located from the
+        engine of ctx if given and from the recorded directory otherwise."""
+        state = self._meta('state')
+        if state == None:
+            return True
+        if ctx != None:
+            home = home_dir(ctx)
+        else:
+            home = self._meta('home')
+        if home == None or home != self._meta('home'):
+            return True
+        current = KeyringWatcher(home).state()
+        return tuple([tuple(item) for item in state]) != current
+
+    def sync(self, ctx):
+        """Updates the file from the keyring of ctx if it is stale.  Only
+        keys which changed are rewritten in memory (see KeyIndex.refresh())
+        before the file is saved again.  Returns True if it was stale."""
+        if not self.stale(ctx):
+            return False
+        index = self.load()
+        index.refresh(ctx)
+        self.save(index)
+        return True
+
+    def _select(self, kind, value):
+        rows = self.db.execute("SELECT DISTINCT keys.entry FROM lookup "
+                               "JOIN keys ON lookup.fpr = keys.fpr "
+                               "WHERE lookup.kind = ? AND lookup.value = ? "
+                               "ORDER BY keys.fpr", (kind, value))
+        return tuple([self._entry(text) for (text,) in rows])
+
+    def by_fingerprint(self, fpr):
+        row = self.db.execute("SELECT entry FROM keys WHERE fpr = ?",
+                              (fpr.upper(),)).fetchone()
+        if row == None:
+            return None
+        return self._entry(row[0])
+
+    def by_keyid(self, keyid):
+        keyid = keyid.upper()
+        if keyid.startswith('0X'):
+            keyid = keyid[2:]
+        return self._select('keyid', keyid)
+
+    def by_email(self, email):
+        return self._select('email', normalize_email(email))
+
+    def by_token(self, token):
+        return self._select('token', token.lower())
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM keys").fetchone()[0]
+
+    def __contains__(self, fpr):
+        return self.by_fingerprint(fpr) != None
@@ -0,0 +1,211 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""Pools of reusable pyme objects."""
+
+import threading
+import queue
+from contextlib import contextmanager
+from . import core
+
+class DataPool(object):
+    """A pool of empty Data objects meant to be reused as operation output.
+
+    Objects are memory sinks (see Data.new_sink()), or spooled temporary
+    files if spool is given (see Data.new_spooled()).  Returning an object
+    to the pool resets it, which truncates it in place and keeps its
+    gpgme data object and, for sinks, the allocated memory.  At most size
+    idle objects are kept.
+
+    The pool may be shared between threads."""
+
+    def __init__(self, size = 16, spool = None):
+        self.size = size
+        self.spool = spool
+        self._lock = threading.Lock()
+        self._idle = []
+
+    def _create(self):
+        if self.spool != None:
+            return core.Data(spool=self.spool)
+        return core.Data(sink=True)
+
+    def get(self):
+        """Returns an empty Data object from the pool, creating one if the
+        pool is empty."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._create()
+
+    def put(self, data):
+        """Resets data and gives it back to the pool."""
+        data.reset()
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(data)
+
+    @contextmanager
+    def data(self):
+        """Context manager handing out a Data object for the duration of
+        the with block."""
+        data = self.get()
+        try:
+            yield data
+        finally:
+            self.put(data)
+
+class ContextPool(object):
+    """A fixed number of identically configured Context objects which can
+    be checked out by threads one at a time.
+
+    All contexts are created up front with the given configuration:
+    protocol, armor, textmode, keylist_mode, engine_info (a
+    (proto, file_name, home_dir) tuple passed to set_engine_info()),
+    signers (a list of keys or a SignerSet), passphrase_cb and
+    progress_cb (a function or a (function, hook) tuple) and key_cache
+    (a keycache.KeyCache shared by all contexts).  The settings of each
+    context are recorded once it is configured.  When it is returned to
+    the pool its protocol, armor, textmode, keylist mode, passphrase,
+    progress and io callbacks, key cache, signers and signature notations
+    are restored, so changes made during one checkout do not leak into
+    the next one.  Engine configuration is restored only if engine_info
+    was given.  A context returned after an exception is discarded and
+    replaced by a new one.
+
+    The size of the pool bounds the number of concurrent operations."""
+
+    def __init__(self, size = 4, protocol = None, armor = None,
+                 textmode = None, keylist_mode = None, engine_info = None,
+                 signers = None, passphrase_cb = None, progress_cb = None,
+                 key_cache = None):
+        self.size = size
+        self.protocol = protocol
+        self.armor = armor
+        self.textmode = textmode
+        self.keylist_mode = keylist_mode
+        self.engine_info = engine_info
+        self.signers = signers
+        self.passphrase_cb = passphrase_cb
+        self.progress_cb = progress_cb
+        self.key_cache = key_cache
+        self._lock = threading.Lock()
+        self._settings = {}
+        self._idle = queue.Queue(size)
+        for i in range(size):
+            self._idle.put(self._create())
+
+    def _set_cb(self, setter, cb):
+        if cb == None:
+            setter(None)
+        elif type(cb) == tuple:
+            setter(*cb)
+        else:
+            setter(cb)
+
+    def _create(self):
+        ctx = core.Context()
+        if self.protocol != None:
+            ctx.set_protocol(self.protocol)
+        if self.engine_info != None:
+            ctx.set_engine_info(*self.engine_info)
+        if self.passphrase_cb != None:
+            self._set_cb(ctx.set_passphrase_cb, self.passphrase_cb)
+        if self.progress_cb != None:
+            self._set_cb(ctx.set_progress_cb, self.progress_cb)
+        if self.key_cache != None:
+            ctx.set_key_cache(self.key_cache)
+        if self.armor != None:
+            ctx.set_armor(self.armor)
+        if self.textmode != None:
+            ctx.set_textmode(self.textmode)
+        if self.keylist_mode != None:
+            ctx.set_keylist_mode(self.keylist_mode)
+        self._record(ctx)
+        self._reset(ctx)
+        return ctx
+
+    def _record(self, ctx):
+        settings = {'protocol': ctx.get_protocol(),
+                    'armor': ctx.get_armor(),
+                    'textmode': ctx.get_textmode(),
+                    'keylist_mode': ctx.get_keylist_mode(),
+                    'passcb': ctx.last_passcb,
+                    'progresscb': ctx.last_progresscb}
+        with self._lock:
+            self._settings[ctx] = settings
+
+    def _forget(self, ctx):
+        with self._lock:
+            self._settings.pop(ctx, None)
+
+    def _reset(self, ctx):
+        with self._lock:
+            settings = self._settings[ctx]
+        if ctx.get_protocol() != settings['protocol']:
+            ctx.set_protocol(settings['protocol'])
+        if self.engine_info != None:
+            ctx.set_engine_info(*self.engine_info)
+        ctx.set_armor(settings['armor'])
+        ctx.set_textmode(settings['textmode'])
+        ctx.set_keylist_mode(settings['keylist_mode'])
+        # Setting a callback replaces the holder it is kept in, so a
+        # different holder means the borrower changed the callback.
+        if ctx.last_passcb is not settings['passcb']:
+            self._set_cb(ctx.set_passphrase_cb, self.passphrase_cb)
+            settings['passcb'] = ctx.last_passcb
+        if ctx.last_progresscb is not settings['progresscb']:
+            self._set_cb(ctx.set_progress_cb, self.progress_cb)
+            settings['progresscb'] = ctx.last_progresscb
+        if ctx.last_iocb != None:
+            ctx.set_io_cbs(None)
+        ctx.set_key_cache(self.key_cache)
+        if self.signers != None:
+            ctx.set_signers(self.signers)
+        else:
+            ctx.signers_clear()
+        ctx.sig_notation_clear()
+
+    def get(self, block = True, timeout = None):
+        """Checks out a Context, waiting for one to be returned if all are
+        in use.  Raises queue.Empty if none became available in time."""
+        return self._idle.get(block, timeout)
+
+    def put(self, ctx, discard = False):
+        """Returns ctx to the pool.  If discard is True the context is
+        dropped and a fresh one takes its place."""
+        if not discard:
+            try:
+                self._reset(ctx)
+            except:
+                discard = True
+        if discard:
+            self._forget(ctx)
+            ctx = self._create()
+        self._idle.put(ctx)
+
+    @contextmanager
+    def context(self, timeout = None):
+        """Context manager checking out a Context for the duration of the
+        with block."""
+        ctx = self.get(True, timeout)
+        try:
+            yield ctx
+        except:
+            self.put(ctx, True)
+            raise
+        self.put(ctx)
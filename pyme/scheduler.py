@@ -0,0 +1,238 @@
+# $Id$
+# Copyright (C) 2026 The pyme3 contributors
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 59 Temple Place, Suite 330, Boston, MA 02111-1307  USA
+
+"""Running operations of many Contexts concurrently.
+
+The Scheduler drives the op_*_start() operations of any number of
+Context objects from a single selectors loop using gpgme's external
+event loop interface (Context.set_io_cbs()).  Each submitted operation
+gets a concurrent.futures.Future resolving to its Context:
+
+    sched = scheduler.Scheduler(max_inflight=8)
+    futures = [sched.submit(ctx, 'op_sign', (plain, sig, mode.DETACH))
+               for ctx, plain, sig in jobs]
+    sched.run()
+"""
+
+import collections
+import selectors
+import time
+from concurrent.futures import Future
+from . import pygpgme
+from . import errors
+
+class _Operation(object):
+    """Context.set_io_cbs() handler for one submitted operation."""
+
+    def __init__(self, scheduler, ctx, name, args, future, timeout):
+        self.scheduler = scheduler
+        self.ctx = ctx
+        self.name = name
+        self.args = args
+        self.future = future
+        self.timeout = timeout
+        self.deadline = None
+        self.timed_out = False
+        self.status = None
+
+    def add(self, fd, dir, tag):
+        self.scheduler._register(fd, dir, tag, self)
+
+    def remove(self, tag):
+        self.scheduler._unregister(tag)
+
+    def event(self, type, err):
+        if type == pygpgme.GPGME_EVENT_DONE:
+            self.finish(err)
+
+    def finish(self, err):
+        # Completion is reported from within gpgme, so the operation is
+        # only queued here and wrapped up by the scheduler loop.
+        if self.status == None:
+            self.status = err
+            self.scheduler._finished.append(self)
+
+class Scheduler(object):
+    """Runs asynchronous operations of many Contexts on one selector.
+
+    At most max_inflight operations (unlimited if None) are running at
+    any time; further submissions wait in a queue.  A Context must not be
+    submitted again before its previous operation has completed."""
+
+    def __init__(self, max_inflight = None, selector = None):
+        self.max_inflight = max_inflight
+        if selector == None:
+            selector = selectors.DefaultSelector()
+        self._selector = selector
+        self._pending = collections.deque()
+        self._running = set()
+        self._finished = []
+        self._fds = {}
+        self._tags = {}
+
+    def submit(self, ctx, name, args = (), callback = None, timeout = None):
+        """Queues ctx.<name>_start(*args), for instance name 'op_encrypt'.
+
+        Returns a Future whose result is ctx once the operation succeeded,
+        so that op_*_result() can be queried, or which raises GPGMEError.
+        If callback is given it is added as a done callback of the
+        Future.  If timeout is given the operation is cancelled when it
+        has been running for that many seconds and the Future raises
+        errors.OperationTimeout.  Operations only make progress inside
+        run()."""
+        future = Future()
+        if callback != None:
+            future.add_done_callback(callback)
+        self._pending.append(_Operation(self, ctx, name, tuple(args), future,
+                                        timeout))
+        return future
+
+    def pending(self):
+        """Returns the number of submitted operations not yet completed."""
+        return len(self._pending) + len(self._running)
+
+    def run(self, timeout = None):
+        """Runs the loop until all submitted operations have completed or
+        timeout seconds have passed.  Returns True if nothing is left."""
+        if timeout != None:
+            deadline = time.monotonic() + timeout
+        self._start_pending()
+        while self._running:
+            self._complete_finished()
+            if not self._running:
+                break
+            now = time.monotonic()
+            if timeout != None:
+                wait = deadline - now
+                if wait <= 0:
+                    break
+            else:
+                wait = None
+            for op in self._running:
+                if op.deadline != None and (wait == None or
+                                            op.deadline - now < wait):
+                    wait = max(op.deadline - now, 0)
+            if not self._fds:
+                # Nothing to wait for until gpgme reports completion.
+                wait = 0
+            for key, mask in self._selector.select(wait):
+                self._dispatch(key.fd, mask)
+            self._expire()
+            self._complete_finished()
+        return self.pending() == 0
+
+    def _start_pending(self):
+        while self._pending and (self.max_inflight == None or
+                                 len(self._running) < self.max_inflight):
+            op = self._pending.popleft()
+            if not op.future.set_running_or_notify_cancel():
+                continue
+            op.ctx.set_io_cbs(op)
+            self._running.add(op)
+            if op.timeout != None:
+                op.deadline = time.monotonic() + op.timeout
+            try:
+                getattr(op.ctx, op.name + '_start')(*op.args)
+            except Exception as excp:
+                # Also covers a bad operation name or bad arguments, which
+                # would otherwise leave the operation running forever.
+                self._running.discard(op)
+                for tag in self._leftover(op):
+                    self._unregister(tag)
+                op.ctx.set_io_cbs(None)
+                op.future.set_exception(excp)
+
+    def _complete_finished(self):
+        while self._finished:
+            op = self._finished.pop(0)
+            if op not in self._running:
+                continue
+            self._running.discard(op)
+            if self._leftover(op):
+                # Failed from an I/O handler: stop the engine and drop
+                # whatever gpgme did not remove itself.
+                pygpgme.gpgme_cancel(op.ctx.wrapped)
+                for tag in self._leftover(op):
+                    self._unregister(tag)
+            op.ctx.set_io_cbs(None)
+            op.ctx._operation_done()
+            if op.status and op.timed_out:
+                op.future.set_exception(errors.OperationTimeout(op.status,
+                        "Deadline of %s seconds exceeded" % op.timeout,
+                        op.timeout))
+            elif op.status:
+                op.future.set_exception(errors.GPGMEError(op.status,
+                                        "Invocation of gpgme_" + op.name))
+            else:
+                op.future.set_result(op.ctx)
+            self._start_pending()
+
+    def _expire(self):
+        now = time.monotonic()
+        for op in list(self._running):
+            if op.status == None and op.deadline != None and \
+                   op.deadline <= now:
+                op.timed_out = True
+                # gpgme reports the cancellation through the DONE event;
+                # finish() only covers engines that already went away.
+                pygpgme.gpgme_cancel(op.ctx.wrapped)
+                op.finish(errors.CANCELED)
+
+    def _leftover(self, op):
+        return [tag for tag, (fd, event) in self._tags.items()
+                if self._fds[fd][event][1] is op]
+
+    def _register(self, fd, dir, tag, op):
+        if dir:
+            event = selectors.EVENT_READ
+        else:
+            event = selectors.EVENT_WRITE
+        entry = self._fds.get(fd)
+        if entry == None:
+            entry = self._fds[fd] = {}
+            entry[event] = (tag, op)
+            self._selector.register(fd, event)
+        else:
+            entry[event] = (tag, op)
+            self._selector.modify(fd, self._mask(entry))
+        self._tags[tag] = (fd, event)
+
+    def _unregister(self, tag):
+        fd, event = self._tags.pop(tag)
+        entry = self._fds[fd]
+        del entry[event]
+        if entry:
+            self._selector.modify(fd, self._mask(entry))
+        else:
+            del self._fds[fd]
+            self._selector.unregister(fd)
+
+    def _mask(self, entry):
+        mask = 0
+        for event in entry:
+            mask |= event
+        return mask
+
+    def _dispatch(self, fd, mask):
+        for event in (selectors.EVENT_READ, selectors.EVENT_WRITE):
+            entry = self._fds.get(fd)
+            if not (mask & event) or entry == None or event not in entry:
+                continue
+            tag, op = entry[event]
+            err = pygpgme.pygpgme_io_dispatch(tag)
+            if err:
+                op.finish(err)